@@ -0,0 +1,16 @@
+import pytest
+
+from tasks.testing import enable_eager_tasks
+from yatube.testing import add_test_replica
+
+
+@pytest.fixture(autouse=True, scope='session')
+def eager_tasks(django_test_environment):
+    """То же, что ``EagerTasksRunner`` для ``manage.py test``."""
+    enable_eager_tasks()
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    """Реплика для тестов маршрутизации, как в ``yatube.testing``."""
+    add_test_replica()
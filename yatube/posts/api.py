@@ -0,0 +1,258 @@
+"""
+JSON API: те же ленты, что и HTML-страницы, без шаблонов и форм, и
+пакетная запись постов, комментариев и подписок из NDJSON.
+
+Объекты сериализуются словарями функций-геттеров; ``?fields=id,text``
+оставляет в ответе только перечисленные поля. Списки листаются
+курсором ``?cursor=`` из ``next``/``previous``. Ответы сжимаются gzip и
+отдают ETag: ленты — по поколениям, как HTML-страницы, лента подписок —
+по версии ленты пользователя.
+
+Пакетные ручки принимают тело ``application/x-ndjson`` построчно и
+отвечают ``{"created": n, "errors": [...]}``; правила строк описаны в
+``posts.batch``. Выгрузка своих данных отдается потоком в NDJSON или
+CSV, см. ``posts.export``.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import (condition, require_GET,
+                                          require_POST)
+from yatube.metrics import query_budget
+
+from .batch import import_rows
+from .cache import (author_scopes, conditional_page, feed_version,
+                    group_scopes, index_scopes)
+from .counters import get_counters
+from .export import EXPORTS, FORMATS, export_lines
+from .models import Group, Post, User
+from .paginators import (COMMENT_ORDERING, COMMENTS_PER_PAGE,
+                         POSTS_PER_PAGE, CursorPaginator)
+from .timeline import TimelinePaginator
+
+# Параметры запроса, от которых зависит закэшированный ответ API.
+API_PARAMS = ('cursor', 'fields')
+
+
+class FieldsError(ValueError):
+    pass
+
+
+class Serializer:
+    """Набор полей объекта: имя → функция от объекта."""
+    def __init__(self, fields):
+        self.fields = fields
+
+    def project(self, requested):
+        """Поля из ``?fields=``; пустой параметр — все поля."""
+        if not requested:
+            return list(self.fields.items())
+        names = [name.strip() for name in requested.split(',')]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise FieldsError(f'Неизвестные поля: {", ".join(unknown)}')
+        return [(name, self.fields[name]) for name in names]
+
+    def many(self, objects, requested=None):
+        fields = self.project(requested)
+        return [{name: get(obj) for name, get in fields} for obj in objects]
+
+    def one(self, obj, requested=None):
+        return {name: get(obj) for name, get in self.project(requested)}
+
+
+def _datetime(value):
+    return value.isoformat()
+
+
+posts = Serializer({
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: _datetime(post.pub_date),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+})
+
+comments = Serializer({
+    'id': lambda comment: comment.pk,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: _datetime(comment.created),
+})
+
+groups = Serializer({
+    'slug': lambda group: group.slug,
+    'title': lambda group: group.title,
+    'description': lambda group: group.description,
+})
+
+authors = Serializer({
+    'username': lambda user: user.username,
+    'first_name': lambda user: user.first_name,
+    'last_name': lambda user: user.last_name,
+    'posts_count': lambda user: get_counters(user).posts_count,
+    'followers_count': lambda user: get_counters(user).followers_count,
+    'following_count': lambda user: get_counters(user).following_count,
+})
+
+
+def api_view(view):
+    """Ошибки API отдаются в JSON, а не HTML-страницами."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено'}, status=404)
+        except FieldsError as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+    return wrapper
+
+
+def login_required_json(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется авторизация'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _page(request, queryset, serializer, per_page=POSTS_PER_PAGE,
+          ordering=('-pub_date', '-id'), **extra):
+    return _paginated(
+        request, CursorPaginator(queryset, per_page, ordering=ordering),
+        serializer, **extra)
+
+
+def _paginated(request, paginator, serializer, **extra):
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        **extra,
+        'results': serializer.many(page, request.GET.get('fields')),
+        'next': paginator.next_cursor,
+        'previous': paginator.previous_cursor,
+    })
+
+
+@gzip_page
+@api_view
+@require_GET
+@query_budget(3)
+@conditional_page(index_scopes, API_PARAMS)
+def index(request):
+    return _page(request, Post.objects.for_feed(), posts)
+
+
+@gzip_page
+@api_view
+@require_GET
+@query_budget(5)
+@conditional_page(group_scopes, API_PARAMS)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _page(request, Post.objects.for_feed().filter(group=group),
+                 posts, group=groups.one(group))
+
+
+@gzip_page
+@api_view
+@require_GET
+@query_budget(6)
+@conditional_page(author_scopes, API_PARAMS)
+def profile(request, username):
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
+    return _page(request, Post.objects.for_feed().filter(author=author),
+                 posts, author=authors.one(author))
+
+
+@gzip_page
+@api_view
+@require_GET
+@query_budget(6)
+@conditional_page(author_scopes, API_PARAMS)
+def post_view(request, username, post_id):
+    post = get_object_or_404(Post.objects.for_feed(),
+                             author__username=username, id=post_id)
+    return JsonResponse(posts.one(post, request.GET.get('fields')))
+
+
+@gzip_page
+@api_view
+@require_GET
+@query_budget(3)
+@conditional_page(author_scopes, API_PARAMS)
+def post_comments(request, username, post_id):
+    post = get_object_or_404(Post, author__username=username, id=post_id)
+    return _page(request, post.comments.select_related('author'), comments,
+                 per_page=COMMENTS_PER_PAGE, ordering=COMMENT_ORDERING)
+
+
+def _follow_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    version = feed_version(request.user.pk)
+    return hashlib.md5(
+        f'{version}|{request.get_full_path()}|{request.user.pk}'.encode()
+    ).hexdigest()
+
+
+@gzip_page
+@api_view
+@require_GET
+@login_required_json
+@query_budget(3)
+@condition(etag_func=_follow_etag)
+def follow_index(request):
+    return _paginated(
+        request, TimelinePaginator(request.user, POSTS_PER_PAGE), posts)
+
+
+def _batch(kind):
+    @api_view
+    @require_POST
+    @login_required_json
+    def view(request):
+        result = import_rows(
+            kind, request, user=request.user,
+            trusted=request.user.is_staff, max_rows=settings.BATCH_MAX_ROWS)
+        status = 400 if result['errors'] and not result['created'] else 200
+        return JsonResponse(result, status=status)
+    view.__name__ = f'batch_{kind}'
+    return view
+
+
+batch_posts = _batch('posts')
+batch_comments = _batch('comments')
+batch_follows = _batch('follows')
+
+
+@gzip_page
+@api_view
+@require_GET
+@login_required_json
+def export(request, username, kind):
+    """Свои посты, комментарии или подписки; сотрудникам — любые."""
+    if kind not in EXPORTS:
+        raise Http404
+    user = get_object_or_404(User, username=username)
+    if user != request.user and not request.user.is_staff:
+        return JsonResponse({'detail': 'Нет доступа'}, status=403)
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in FORMATS:
+        return JsonResponse(
+            {'detail': f'Неизвестный формат: {export_format}'}, status=400)
+    response = StreamingHttpResponse(
+        export_lines(kind, user, export_format),
+        content_type=FORMATS[export_format][0])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{user.username}-{kind}.{export_format}"')
+    return response
@@ -0,0 +1,21 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.index, name='index'),
+    path('follow/', api.follow_index, name='follow_index'),
+    path('groups/<slug:slug>/posts/', api.group_posts, name='group_posts'),
+    path('users/<str:username>/posts/', api.profile, name='profile'),
+    path('users/<str:username>/posts/<int:post_id>/', api.post_view,
+         name='post'),
+    path('users/<str:username>/posts/<int:post_id>/comments/',
+         api.post_comments, name='post_comments'),
+    path('users/<str:username>/export/<str:kind>/', api.export,
+         name='export'),
+    path('batch/posts/', api.batch_posts, name='batch_posts'),
+    path('batch/comments/', api.batch_comments, name='batch_comments'),
+    path('batch/follows/', api.batch_follows, name='batch_follows'),
+]
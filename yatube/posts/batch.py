@@ -0,0 +1,349 @@
+"""
+Пакетная запись постов, комментариев и подписок из NDJSON.
+
+Каждая строка — JSON-объект, который проверяется теми же правилами, что
+и одиночная запись: ``PostForm``, ``CommentForm`` и ограничения
+``profile_follow``. Строки обрабатываются пачками: проверка без
+транзакции, затем ``bulk_create`` и пересчет производных данных в одной
+транзакции на пачку. Ошибки возвращаются по номерам строк, остальные
+строки пачки сохраняются.
+
+``bulk_create`` не вызывает сигналы, поэтому счетчики, ленты подписок,
+поисковый индекс и кэш страниц обновляются здесь, по разу на пачку.
+
+Поля ``author``, ``user``, ``pub_date`` и ``created`` позволяют писать
+от имени других пользователей и задавать даты; они доступны только
+доверенному импорту — сотрудникам и management-команде.
+"""
+import json
+from collections import Counter
+
+from django import forms
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search, timeline
+from .cache import bump_feed_versions, bump_generations, invalidate_post_pages
+from .counters import bump_comments_count, bump_user_counters
+from .forms import CommentForm, PostForm
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 1000
+TRUSTED_ONLY = 'Поле доступно только доверенному импорту.'
+
+
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+    """Выбор объекта из заранее загруженного словаря, без запроса."""
+    def __init__(self, objects, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice', params={'value': value})
+
+
+class BatchPostForm(PostForm):
+    def __init__(self, data, groups):
+        super().__init__(data)
+        field = self.fields['group']
+        self.fields['group'] = PreloadedModelChoiceField(
+            groups, queryset=field.queryset, required=field.required,
+            label=field.label)
+
+
+def _insert(model, objects):
+    """
+    ``bulk_create`` с первичными ключами у объектов. SQLite в Django 3.2
+    их не возвращает, но строки вставлены под блокировкой записи текущей
+    транзакции и заняли последние ключи подряд.
+    """
+    model.objects.bulk_create(objects, batch_size=CHUNK_SIZE)
+    if objects[0].pk is None:
+        last = model.objects.aggregate(last=Max('pk'))['last']
+        for pk, obj in enumerate(objects, start=last - len(objects) + 1):
+            obj.pk = pk
+    for obj in objects:
+        obj._state.adding = False
+
+
+def _form_errors(form):
+    return {field: list(messages) for field, messages in form.errors.items()}
+
+
+class Importer:
+    """
+    Одна пачка строк: ``preload`` читает все нужные объекты разом,
+    ``build`` проверяет строку и возвращает объект или ошибки,
+    ``after_insert`` обновляет производные данные сохраненных объектов.
+    """
+    model = None
+
+    def __init__(self, user=None, trusted=False):
+        self.user = user
+        self.trusted = trusted
+
+    def preload(self, rows):
+        pass
+
+    def build(self, data):
+        raise NotImplementedError
+
+    def after_insert(self, objects):
+        pass
+
+    def _users(self, rows, *fields):
+        usernames = {
+            data[field] for data in rows for field in fields
+            if isinstance(data.get(field), str)
+        }
+        return User.objects.in_bulk(usernames, field_name='username')
+
+    def _actor(self, data, field, errors):
+        """Автор строки: текущий пользователь или ``data[field]``."""
+        if field not in data:
+            if self.user is None:
+                errors[field] = ['Обязательное поле.']
+            return self.user
+        if not self.trusted:
+            errors[field] = [TRUSTED_ONLY]
+            return None
+        user = self.users.get(data[field])
+        if user is None:
+            errors[field] = ['Пользователь не найден.']
+        return user
+
+    def _date(self, data, field, errors):
+        if field not in data:
+            return None
+        if not self.trusted:
+            errors[field] = [TRUSTED_ONLY]
+            return None
+        value = parse_datetime(str(data[field]))
+        if value is None:
+            errors[field] = ['Неверный формат даты.']
+            return None
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.utc)
+        return value
+
+    def _set_dates(self, objects, field):
+        """
+        ``auto_now_add`` перезаписывает дату при вставке, поэтому даты из
+        импорта проставляются после нее.
+        """
+        dated = [obj for obj in objects if obj._imported_date is not None]
+        for obj in dated:
+            setattr(obj, field, obj._imported_date)
+        if dated:
+            self.model.objects.bulk_update(dated, [field],
+                                           batch_size=CHUNK_SIZE)
+
+    def process(self, chunk, result):
+        rows, errors = [], []
+        for number, line in chunk:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            if isinstance(data, dict):
+                rows.append((number, data))
+            else:
+                errors.append({
+                    'line': number,
+                    'errors': {'__all__': ['Строка не JSON-объект.']},
+                })
+        self.preload([data for _, data in rows])
+        objects = []
+        for number, data in rows:
+            obj, row_errors = self.build(data)
+            if row_errors:
+                errors.append({'line': number, 'errors': row_errors})
+            else:
+                obj._line = number
+                objects.append(obj)
+        result['errors'].extend(sorted(errors, key=lambda e: e['line']))
+        if not objects:
+            return
+        try:
+            with transaction.atomic():
+                _insert(self.model, objects)
+                self.after_insert(objects)
+        except IntegrityError as error:
+            # Например, та же подписка, созданная параллельно.
+            result['errors'].extend(
+                {'line': obj._line, 'errors': {'__all__': [str(error)]}}
+                for obj in objects)
+            return
+        result['created'] += len(objects)
+
+
+class PostImporter(Importer):
+    """Строки ``{"text", "group", "author", "pub_date"}``."""
+    model = Post
+
+    def preload(self, rows):
+        if not hasattr(self, 'groups'):
+            self.groups = Group.objects.in_bulk()
+        self.users = self._users(rows, 'author') if self.trusted else {}
+
+    def build(self, data):
+        errors = {}
+        author = self._actor(data, 'author', errors)
+        pub_date = self._date(data, 'pub_date', errors)
+        form = BatchPostForm(
+            {'text': data.get('text'), 'group': data.get('group')},
+            self.groups)
+        if not form.is_valid():
+            errors.update(_form_errors(form))
+        if errors:
+            return None, errors
+        post = form.save(commit=False)
+        post.author = author
+        post._imported_date = pub_date
+        return post, None
+
+    def after_insert(self, posts):
+        self._set_dates(posts, 'pub_date')
+        for author_id, count in Counter(
+                post.author_id for post in posts).items():
+            bump_user_counters(author_id, posts_count=count)
+        search.get_backend().index_many(
+            [(post.pk, post.text) for post in posts])
+        timeline.fan_out_many(posts)
+        pages = {}
+        for post in posts:
+            pages.setdefault(post.author_id, set()).add(post.group_id)
+        transaction.on_commit(lambda: [
+            invalidate_post_pages(author_id, *group_ids)
+            for author_id, group_ids in pages.items()
+        ])
+
+
+class CommentImporter(Importer):
+    """Строки ``{"post", "text", "author", "created"}``."""
+    model = Comment
+
+    def preload(self, rows):
+        ids = [data['post'] for data in rows
+               if isinstance(data.get('post'), int)]
+        self.posts = Post.objects.only(
+            'pk', 'author_id', 'group_id').in_bulk(ids)
+        self.users = self._users(rows, 'author') if self.trusted else {}
+
+    def build(self, data):
+        errors = {}
+        author = self._actor(data, 'author', errors)
+        created = self._date(data, 'created', errors)
+        post = self.posts.get(data.get('post'))
+        if post is None:
+            errors['post'] = ['Пост не найден.']
+        form = CommentForm({'text': data.get('text')})
+        if not form.is_valid():
+            errors.update(_form_errors(form))
+        if errors:
+            return None, errors
+        comment = form.save(commit=False)
+        comment.post = post
+        comment.author = author
+        comment._imported_date = created
+        return comment, None
+
+    def after_insert(self, comments):
+        self._set_dates(comments, 'created')
+        for post_id, count in Counter(
+                comment.post_id for comment in comments).items():
+            bump_comments_count(post_id, count)
+        pages = {}
+        for comment in comments:
+            post = self.posts[comment.post_id]
+            pages.setdefault(post.author_id, set()).add(post.group_id)
+        transaction.on_commit(lambda: [
+            invalidate_post_pages(author_id, *group_ids)
+            for author_id, group_ids in pages.items()
+        ])
+
+
+class FollowImporter(Importer):
+    """Строки ``{"author", "user"}``: подписка ``user`` на ``author``."""
+    model = Follow
+
+    def preload(self, rows):
+        self.users = self._users(rows, 'author', 'user')
+        user_ids = {self.user.pk} if self.user is not None else set()
+        user_ids.update(user.pk for user in self.users.values())
+        self.existing = set(Follow.objects.filter(
+            user_id__in=user_ids, author_id__in=user_ids,
+        ).values_list('user_id', 'author_id'))
+
+    def build(self, data):
+        errors = {}
+        user = self._actor(data, 'user', errors)
+        author = self.users.get(data.get('author'))
+        if author is None:
+            errors['author'] = ['Пользователь не найден.']
+        if errors:
+            return None, errors
+        if user == author:
+            return None, {'author': ['Нельзя подписаться на себя.']}
+        if (user.pk, author.pk) in self.existing:
+            return None, {'author': ['Подписка уже есть.']}
+        self.existing.add((user.pk, author.pk))
+        return Follow(user=user, author=author), None
+
+    def after_insert(self, follows):
+        for user_id, count in Counter(
+                follow.user_id for follow in follows).items():
+            bump_user_counters(user_id, following_count=count)
+        for author_id, count in Counter(
+                follow.author_id for follow in follows).items():
+            bump_user_counters(author_id, followers_count=count)
+        for follow in follows:
+            timeline.backfill(follow.user_id, follow.author_id)
+        user_ids = {follow.user_id for follow in follows}
+        scopes = {f'author:{pk}' for follow in follows
+                  for pk in (follow.user_id, follow.author_id)}
+        transaction.on_commit(lambda: (
+            bump_feed_versions(user_ids), bump_generations(*scopes)))
+
+
+IMPORTERS = {
+    'posts': PostImporter,
+    'comments': CommentImporter,
+    'follows': FollowImporter,
+}
+
+
+def import_rows(kind, lines, user=None, trusted=False,
+                chunk_size=CHUNK_SIZE, max_rows=None):
+    """
+    Записать строки NDJSON вида ``kind``. Возвращает
+    ``{"created": n, "errors": [{"line": номер, "errors": {...}}]}``.
+    """
+    importer = IMPORTERS[kind](user=user, trusted=trusted)
+    result = {'created': 0, 'errors': []}
+    chunk = []
+    rows = 0
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        rows += 1
+        if max_rows is not None and rows > max_rows:
+            result['errors'].append({'line': number, 'errors': {
+                '__all__': [f'Не больше {max_rows} строк за запрос.']}})
+            break
+        chunk.append((number, line))
+        if len(chunk) == chunk_size:
+            importer.process(chunk, result)
+            chunk = []
+    if chunk:
+        importer.process(chunk, result)
+    return result
@@ -0,0 +1,218 @@
+"""
+Нагрузочные замеры страниц из ``posts/urls.py`` на данных, созданных
+``seeding.seed_dataset``. Ленты подписок заполняются только для читателя
+из замеров.
+
+Каждая страница измеряется дважды: последовательно тестовым клиентом и
+параллельно несколькими потоками, которые вызывают WSGI-приложение
+напрямую. Результат — словарь, который команда ``benchmark`` сохраняет
+в JSON.
+"""
+import math
+import sys
+import threading
+import time
+from io import BytesIO
+from urllib.parse import quote
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client
+from django.urls import reverse
+
+from . import timeline
+from .models import Follow, Group, Post, User
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def measure_client(client, paths, requests):
+    """Последовательные запросы тестовым клиентом по кругу ``paths``."""
+    latencies = []
+    statuses = set()
+    queries = 0
+    started = time.perf_counter()
+    for index in range(requests):
+        request_started = time.perf_counter()
+        response = client.get(paths[index % len(paths)])
+        latencies.append(time.perf_counter() - request_started)
+        statuses.add(response.status_code)
+        metrics = getattr(response, 'metrics', None)
+        if metrics is not None:
+            queries = max(queries, metrics.queries)
+    result = summarize(latencies, time.perf_counter() - started)
+    result['statuses'] = sorted(statuses)
+    result['max_queries'] = queries
+    return result
+
+
+def _environ(path, cookie):
+    path, _, query = path.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def measure_wsgi(application, paths, cookie, requests, concurrency):
+    """
+    Параллельная нагрузка: ``concurrency`` потоков вызывают WSGI-приложение
+    напрямую, без сети, пока не выполнят ``requests`` запросов.
+    """
+    latencies = []
+    statuses = set()
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            status = []
+            request_started = time.perf_counter()
+            try:
+                response = application(
+                    _environ(paths[index % len(paths)], cookie),
+                    lambda code, headers, exc_info=None: status.append(code),
+                )
+                for _ in response:
+                    pass
+                response.close()
+            except Exception:
+                status = ['500 Internal Server Error']
+            elapsed = time.perf_counter() - request_started
+            with lock:
+                latencies.append(elapsed)
+                statuses.add(int(status[0].split()[0]))
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker)
+                   for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    result = summarize(latencies, time.perf_counter() - started)
+    result['statuses'] = sorted(statuses)
+    return result
+
+
+def targets():
+    """
+    Страницы для замеров: по одной на каждое имя из ``posts/urls.py``.
+    Подписка и отписка меняют данные, поэтому чередуются в одной цели.
+    """
+    author = User.objects.filter(
+        counters__posts_count__gt=0).order_by('-counters__posts_count')[0]
+    follower = Follow.objects.filter(author=author).values('user')[:1]
+    reader = (User.objects.filter(pk__in=follower).first()
+              or User.objects.exclude(pk=author.pk).first())
+    post = Post.objects.filter(author=author).order_by('-comments_count')[0]
+    group = Group.objects.filter(posts__isnull=False).first()
+    stranger = User.objects.exclude(pk__in=Follow.objects.filter(
+        user=reader).values('author')).exclude(pk=reader.pk).first()
+    for follow in Follow.objects.filter(user=reader).select_related('author'):
+        timeline.backfill(reader.pk, follow.author_id)
+    word = quote(post.text.split()[0])
+    return reader, author, [
+        ('index', [reverse('index')], None),
+        ('index_deep_page', [reverse('index') + '?page=50'], None),
+        ('new_post', [reverse('new_post')], reader),
+        ('group_posts', [reverse('group_posts', args=[group.slug])], None),
+        ('follow_index', [reverse('follow_index')], reader),
+        ('search', [reverse('search') + f'?q={word}'], None),
+        ('profile_follow_unfollow', [
+            reverse('profile_follow', args=[stranger.username]),
+            reverse('profile_unfollow', args=[stranger.username]),
+        ], reader),
+        ('profile', [reverse('profile', args=[author.username])], None),
+        ('post', [reverse('post', args=[author.username, post.pk])], None),
+        ('post_comments', [reverse(
+            'post_comments', args=[author.username, post.pk])], None),
+        ('post_edit', [
+            reverse('post_edit', args=[author.username, post.pk])], author),
+        ('api_index', [reverse('api:index')], None),
+        ('api_follow_index', [reverse('api:follow_index')], reader),
+        ('api_profile', [
+            reverse('api:profile', args=[author.username])], None),
+        ('add_comment', [
+            reverse('add_comment', args=[author.username, post.pk])], reader),
+    ]
+
+
+def run(requests, concurrency, cache):
+    """Замерить все цели и вернуть список результатов."""
+    application = WSGIHandler()
+    reader, author, pages = targets()
+    clients = {None: Client()}
+    for user in (reader, author):
+        clients[user] = Client()
+        clients[user].force_login(user)
+    results = []
+    for name, paths, user in pages:
+        client = clients[user]
+        cookie = '; '.join(
+            f'{key}={morsel.value}' for key, morsel in client.cookies.items())
+        cache.clear()
+        cold_started = time.perf_counter()
+        client.get(paths[0])
+        cold_ms = round((time.perf_counter() - cold_started) * 1000, 3)
+        results.append({
+            'name': name,
+            'paths': paths,
+            'authenticated': user is not None,
+            'cold_ms': cold_ms,
+            'client': measure_client(client, paths, requests),
+            'wsgi': measure_wsgi(
+                application, paths, cookie, requests, concurrency),
+        })
+    return results
+
+
+def compare(previous, current, threshold=0.1):
+    """Строки о страницах, у которых p50 или p99 вырос больше threshold."""
+    before = {result['name']: result for result in previous['results']}
+    lines = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            continue
+        for driver in ('client', 'wsgi'):
+            for metric in ('p50_ms', 'p99_ms'):
+                was, now = old[driver][metric], result[driver][metric]
+                if was and now > was * (1 + threshold):
+                    lines.append(
+                        f'{result["name"]} {driver} {metric}: '
+                        f'{was} → {now} (+{(now / was - 1) * 100:.0f}%)')
+    return lines
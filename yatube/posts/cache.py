@@ -0,0 +1,215 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+from tasks.queue import task
+from yatube.routers import reads_from_replica
+
+from .models import Follow, Group, User
+from .timeline import is_fanned_out
+
+FEED_VERSION_KEY = 'posts:feed_version:{}'
+POPULAR_FEED_VERSION_KEY = 'posts:feed_version:popular'
+GENERATION_KEY = 'posts:generation:{}'
+PAGE_KEY = 'posts:page:{}:{}'
+INVALIDATION_BATCH_SIZE = 1000
+
+
+def _read_versions(keys):
+    """
+    Текущие версии по ключам. Отсутствующая версия создается из времени
+    в наносекундах, поэтому удаление ключа — это и есть инвалидация:
+    новая версия никогда не совпадет со старой.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def feed_version(user_id):
+    """Версия ленты подписок пользователя для ключа фрагментного кэша."""
+    keys = [
+        FEED_VERSION_KEY.format(user_id),
+        POPULAR_FEED_VERSION_KEY,
+        GENERATION_KEY.format('groups'),
+    ]
+    versions = _read_versions(keys)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def generation(*scopes):
+    """
+    Поколение закэшированных страниц: ``'index'``, ``'group:<pk>'``,
+    ``'author:<pk>'`` (посты, комментарии, профиль и подписки автора)
+    или ``'groups'``. Входит в ключ фрагмента, поэтому такие фрагменты
+    можно хранить без срока жизни.
+    """
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    versions = _read_versions(keys)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def page_cache_timeout():
+    """
+    Срок жизни фрагментов страниц. Страница, прочитанная с реплики, могла
+    не застать последнюю запись, хотя поколение уже сменилось, поэтому
+    такой фрагмент хранится не дольше ``REPLICA_PAGE_CACHE_TIMEOUT``.
+    """
+    if reads_from_replica():
+        return settings.REPLICA_PAGE_CACHE_TIMEOUT
+    return settings.PAGE_CACHE_TIMEOUT
+
+
+def response_cache_timeout():
+    """
+    Срок жизни целых ответов для анонимов. В отличие от фрагментов он
+    конечен: ключ ответа зависит от параметров запроса, и без срока жизни
+    перебор страниц оставлял бы в кэше записи, которые больше никто не
+    прочитает.
+    """
+    timeout = settings.PAGE_RESPONSE_CACHE_TIMEOUT
+    if reads_from_replica():
+        return min(timeout, settings.REPLICA_PAGE_CACHE_TIMEOUT)
+    return timeout
+
+
+def _response_key(request, params, version):
+    """
+    Ключ ответа: путь и только те параметры ``params``, от которых ответ
+    зависит. Прочие параметры, например ``?utm_source=``, не плодят
+    копий страницы.
+    """
+    query = urlencode([
+        (name, request.GET[name]) for name in params if name in request.GET
+    ])
+    path = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return PAGE_KEY.format(path, version)
+
+
+def _page_validators(request, scopes):
+    """
+    ETag, Last-Modified и поколение страницы. Версия поколения — время
+    его создания в наносекундах, то есть не раньше последнего изменения,
+    поэтому годится и для Last-Modified. Авторизованным пользователям
+    страница рендерится лично, поэтому их ETag включает пользователя и
+    CSRF-токен формы, а Last-Modified не отдается.
+    """
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    versions = _read_versions(keys)
+    if None in versions.values():
+        # Кэш ничего не хранит (dummy): поколения не меняются.
+        return None, None, None
+    version = '.'.join(str(versions[key]) for key in keys)
+    viewer = ''
+    last_modified = None
+    if request.user.is_authenticated:
+        viewer = f'{request.user.pk}:{request.META.get("CSRF_COOKIE", "")}'
+    else:
+        last_modified = datetime.fromtimestamp(
+            max(versions.values()) / 1e9, tz=timezone.utc)
+    etag = hashlib.md5(
+        f'{version}|{request.get_full_path()}|{viewer}'.encode()).hexdigest()
+    return etag, last_modified, version
+
+
+def index_scopes(**kwargs):
+    return ['index', 'groups']
+
+
+def group_scopes(slug, **kwargs):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [f'group:{group_id}', 'groups']
+
+
+def author_scopes(username, **kwargs):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return None if author_id is None else [f'author:{author_id}', 'groups']
+
+
+def conditional_page(scopes, params=('page', 'cursor')):
+    """
+    Условный GET и полностраничный кэш для анонимов по поколениям
+    страницы. ``scopes(**kwargs)`` возвращает поколения из аргументов
+    view или ``None``, если объекта нет и view ответит 404; ``params`` —
+    параметры запроса, которые читает view.
+
+    На совпавший ``If-None-Match``/``If-Modified-Since`` отвечает 304 без
+    рендеринга; анонимам отдает ответ из кэша по пути, ``params`` и
+    поколению.
+    """
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, '_page_validators'):
+            names = scopes(**kwargs)
+            request._page_validators = (
+                (None, None, None) if names is None
+                else _page_validators(request, names))
+        return request._page_validators
+
+    def decorator(view):
+        @condition(
+            etag_func=lambda *args, **kwargs: validators(*args, **kwargs)[0],
+            last_modified_func=(
+                lambda *args, **kwargs: validators(*args, **kwargs)[1]),
+        )
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            version = validators(request, *args, **kwargs)[2]
+            if version is None or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key = _response_key(request, params, version)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, response_cache_timeout())
+            return response
+        return wrapper
+    return decorator
+
+
+def bump_generations(*scopes):
+    cache.delete_many([GENERATION_KEY.format(scope) for scope in scopes])
+
+
+def bump_feed_versions(user_ids):
+    cache.delete_many([FEED_VERSION_KEY.format(pk) for pk in user_ids])
+
+
+@task
+def bump_followers_feeds(author_id):
+    """
+    Сбросить ленты всех подписчиков автора. Посты популярных авторов
+    подмешиваются при чтении, для них сбрасывается общая версия.
+    """
+    if not is_fanned_out(author_id):
+        cache.delete(POPULAR_FEED_VERSION_KEY)
+        return
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True).order_by('user_id')
+    batch = []
+    for user_id in followers.iterator(chunk_size=INVALIDATION_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) == INVALIDATION_BATCH_SIZE:
+            bump_feed_versions(batch)
+            batch = []
+    if batch:
+        bump_feed_versions(batch)
+
+
+def invalidate_post_pages(author_id, *group_ids):
+    """Сбросить все закэшированные страницы, на которых виден пост."""
+    scopes = ['index', f'author:{author_id}']
+    scopes += [f'group:{pk}' for pk in set(group_ids) if pk is not None]
+    bump_generations(*scopes)
+    # Подписчиков может быть много — их ленты сбрасывает очередь.
+    bump_followers_feeds.enqueue(author_id)
@@ -0,0 +1,80 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounter
+
+
+def bump_user_counters(user_id, **deltas):
+    """
+    Атомарно изменить счетчики пользователя: ``posts_count=1``,
+    ``followers_count=-1`` и т.п. Недостающая строка создается только при
+    увеличении счетчика — уменьшать у удаляемого пользователя нечего.
+    """
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    if UserCounter.objects.filter(user_id=user_id).update(**changes):
+        return
+    if all(delta > 0 for delta in deltas.values()):
+        UserCounter.objects.get_or_create(user_id=user_id)
+        UserCounter.objects.filter(user_id=user_id).update(**changes)
+
+
+def bump_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def get_counters(user):
+    """Счетчики пользователя; без строки в базе — нулевые."""
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        return UserCounter(user=user)
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+def reconcile_counters():
+    """
+    Пересчитать все счетчики по исходным таблицам и исправить
+    разошедшиеся. Возвращает число исправленных строк
+    ``(пользователей, постов)``.
+    """
+    users = User.objects.annotate(
+        posts_total=_count(Post.objects, 'author'),
+        followers_total=_count(Follow.objects, 'author'),
+        following_total=_count(Follow.objects, 'user'),
+        posts_stored=Coalesce('counters__posts_count', Value(-1)),
+        followers_stored=F('counters__followers_count'),
+        following_stored=F('counters__following_count'),
+    )
+    fixed_users = 0
+    for user in users.iterator():
+        actual = {
+            'posts_count': user.posts_total,
+            'followers_count': user.followers_total,
+            'following_count': user.following_total,
+        }
+        stored = {
+            'posts_count': user.posts_stored,
+            'followers_count': user.followers_stored,
+            'following_count': user.following_stored,
+        }
+        if actual != stored:
+            UserCounter.objects.update_or_create(
+                user_id=user.pk, defaults=actual)
+            fixed_users += 1
+
+    drifted_posts = Post.objects.annotate(
+        comments_total=_count(Comment.objects, 'post')
+    ).exclude(comments_count=F('comments_total'))
+    fixed_posts = 0
+    for post in drifted_posts.only('pk').iterator():
+        Post.objects.filter(pk=post.pk).update(
+            comments_count=post.comments_total)
+        fixed_posts += 1
+    return fixed_users, fixed_posts
@@ -0,0 +1,95 @@
+"""
+Потоковая выгрузка постов, комментариев и подписок пользователя.
+
+Строки читаются через ``values_list(...).iterator()``: на PostgreSQL это
+серверный курсор, на SQLite — чтение пачками, так что память не растет
+с числом строк, а модели не создаются. Строки NDJSON совпадают с
+форматом ``posts.batch``, поэтому выгрузку можно загрузить обратно
+командой ``import_ndjson``.
+"""
+import csv
+import json
+
+from django.db.models import Q
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+
+
+class Export:
+    """Колонки выгрузки и соответствующие им поля ``values_list``."""
+    def __init__(self, columns, queryset):
+        self.columns = list(columns)
+        self.fields = list(columns.values())
+        self.queryset = queryset
+
+    def rows(self, user):
+        values = self.queryset(user).order_by('pk').values_list(*self.fields)
+        for row in values.iterator(chunk_size=CHUNK_SIZE):
+            yield dict(zip(self.columns, map(_plain, row)))
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+EXPORTS = {
+    'posts': Export(
+        {'id': 'pk', 'text': 'text', 'group': 'group_id',
+         'author': 'author__username', 'pub_date': 'pub_date',
+         'image': 'image'},
+        lambda user: Post.objects.filter(author=user),
+    ),
+    'comments': Export(
+        {'id': 'pk', 'post': 'post_id', 'text': 'text',
+         'author': 'author__username', 'created': 'created'},
+        lambda user: Comment.objects.filter(author=user),
+    ),
+    # Подписки пользователя и подписки на него.
+    'follows': Export(
+        {'user': 'user__username', 'author': 'author__username'},
+        lambda user: Follow.objects.filter(Q(user=user) | Q(author=user)),
+    ),
+}
+
+
+def _ndjson(export, rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Файл для ``csv.writer``, который возвращает строку, а не пишет."""
+    def write(self, value):
+        return value
+
+
+def _csv(export, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(export.columns)
+    for row in rows:
+        yield writer.writerow(row.values())
+
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', _ndjson),
+    'csv': ('text/csv', _csv),
+}
+
+
+def export_lines(kind, user, export_format='ndjson'):
+    """
+    Строки выгрузки ``kind`` в формате ``export_format``, склеенные по
+    ``CHUNK_SIZE``, чтобы не писать в ответ по одной строке.
+    """
+    export = EXPORTS[kind]
+    lines = FORMATS[export_format][1](export, export.rows(user))
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) == CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
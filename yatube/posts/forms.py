@@ -9,6 +9,16 @@ class PostForm(forms.ModelForm):
         fields = ['text', 'group', 'image']
         labels = {'text': 'Текст публикации', 'group': 'Группа'}
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
+    def clean_image(self):
+        """Файл, отклоненный при загрузке, не доходит до формы."""
+        if 'image' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['image'])
+        return self.cleaned_data['image']
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
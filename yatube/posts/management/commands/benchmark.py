@@ -0,0 +1,126 @@
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from posts import benchmark
+from posts.seeding import SCALES, seed_dataset
+from yatube.caches import cache_from_url
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет отдельную тестовую базу синтетическими данными и '
+        'замеряет задержку и пропускную способность страниц постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=sorted(SCALES), default='tiny',
+            help='Размер набора данных.')
+        for name in SCALES['tiny']:
+            parser.add_argument(
+                f'--{name}', type=int,
+                help=f'Переопределить число строк «{name}» из --scale.')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на каждую страницу.')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Потоков в WSGI-нагрузке.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--cache-url', default='locmem://',
+            help='Кэш на время замеров; по умолчанию локальный.')
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона: вывести страницы, ставшие медленнее.')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу после замеров.')
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть > 0')
+
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # Потокам WSGI-нагрузки нужна общая база, а не база в памяти.
+            test_settings['NAME'] = os.path.join(
+                tempfile.gettempdir(), 'yatube-benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=options['verbosity'], autoclobber=True,
+            keepdb=options['keepdb'])
+        caches = {'default': cache_from_url(
+            options['cache_url'], key_prefix='yatube-benchmark')}
+        try:
+            with override_settings(
+                    CACHES=caches, TASKS_EAGER=True, DEBUG=False):
+                report = self._run(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=options['verbosity'],
+                keepdb=options['keepdb'])
+
+        commit = report['commit']
+        output = options['output'] or f'benchmark-{commit}.json'
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        for result in report['results']:
+            self.stdout.write(
+                f'{result["name"]:<26} '
+                f'p50 {result["client"]["p50_ms"]:>8} мс  '
+                f'p99 {result["client"]["p99_ms"]:>8} мс  '
+                f'{result["wsgi"]["rps"]:>8} rps')
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                regressions = benchmark.compare(json.load(file), report)
+            for line in regressions:
+                self.stdout.write(self.style.WARNING(line))
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {output}'))
+
+    def _run(self, sizes, options):
+        started = time.perf_counter()
+        created = seed_dataset(
+            **sizes, rng=random.Random(options['seed']), prefix='bench')
+        seed_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'Данные созданы за {seed_seconds:.1f} с: {created}')
+        results = benchmark.run(
+            options['requests'], options['concurrency'], cache)
+        return {
+            'commit': _git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'cache': options['cache_url'],
+            'scale': created,
+            'seed': options['seed'],
+            'seed_seconds': round(seed_seconds, 3),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
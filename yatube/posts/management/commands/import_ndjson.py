@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.batch import CHUNK_SIZE, IMPORTERS, import_rows
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии или подписки из NDJSON: одна строка — '
+        'один JSON-объект. Строки с ошибками пропускаются и выводятся.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='Файл NDJSON или «-» для stdin.')
+        parser.add_argument(
+            '--user',
+            help='Автор строк без поля author (для подписок — user).')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        user = None
+        if options['user'] is not None:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден.')
+        if options['path'] == '-':
+            result = self._import(sys.stdin, user, options)
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                result = self._import(lines, user, options)
+        for error in result['errors']:
+            self.stderr.write(f'Строка {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {result["created"]}, '
+            f'с ошибками: {len(result["errors"])}'
+        ))
+
+    def _import(self, lines, user, options):
+        return import_rows(options['kind'], lines, user=user, trusted=True,
+                           chunk_size=options['chunk_size'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, подписок и комментариев.'
+
+    def handle(self, *args, **options):
+        fixed_users, fixed_posts = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено пользователей: {fixed_users}, '
+            f'постов: {fixed_posts}'
+        ))
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Group, User
+from posts.seeding import BATCH_SIZE, SCALES, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'подписками и комментариями со степенным распределением активности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=sorted(SCALES), default='tiny',
+            help='Готовый размер набора данных.')
+        for name in SCALES['tiny']:
+            parser.add_argument(
+                f'--{name}', type=int,
+                help=f'Переопределить число строк «{name}» из --scale.')
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Зерно генератора случайных чисел.')
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона: больше — сильнее перекос.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имен пользователей и адресов групп.')
+        parser.add_argument(
+            '--timelines', action='store_true',
+            help='Заполнить ленты подписок (долго на больших объемах).')
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        if any(value < 0 for value in sizes.values()):
+            raise CommandError('Размеры не могут быть отрицательными.')
+        if not sizes['users'] and (
+                sizes['posts'] or sizes['follows'] or sizes['comments']):
+            raise CommandError('Постам и подпискам нужны пользователи.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        prefix = options['prefix']
+        if (User.objects.filter(username__startswith=prefix).exists()
+                or Group.objects.filter(slug__startswith=prefix).exists()):
+            raise CommandError(
+                f'Данные с префиксом «{prefix}» уже есть, выберите '
+                f'другой --prefix.')
+
+        started = time.perf_counter()
+        created = seed_dataset(
+            **sizes,
+            rng=random.Random(options['seed']),
+            alpha=options['alpha'],
+            prefix=prefix,
+            batch_size=options['batch_size'],
+            timelines=options['timelines'],
+            log=self._log if options['verbosity'] > 1 else None,
+        )
+        elapsed = time.perf_counter() - started
+        rows = ', '.join(f'{name}: {value}' for name, value in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано за {elapsed:.1f} с — {rows}'))
+
+    def _log(self, message):
+        self.stdout.write(message)
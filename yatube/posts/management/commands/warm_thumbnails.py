@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import find_thumbnail, generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для картинок существующих постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать и уже готовые миниатюры.')
+
+    def handle(self, *args, **options):
+        # Без order_by() сортировка Post.Meta.ordering попадает в DISTINCT.
+        names = Post.objects.exclude(image='').exclude(
+            image__isnull=True).order_by().values_list(
+            'image', flat=True).distinct()
+        created = failed = 0
+        for name in names.iterator():
+            if not options['force'] and find_thumbnail(name):
+                continue
+            try:
+                generate_thumbnail(name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {created}, ошибок: {failed}'))
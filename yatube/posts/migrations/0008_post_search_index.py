@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE posts_post_fts "
+            "USING fts5(text, tokenize='unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO posts_post_fts (rowid, text) "
+            "SELECT id, text FROM posts_post"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE posts_post ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('russian', text)) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX posts_post_search_vector_idx "
+            "ON posts_post USING GIN (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE posts_post_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE posts_post DROP COLUMN search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
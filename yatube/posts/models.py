@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -13,26 +15,61 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Посты для ленты: автор и группа подтягиваются одним JOIN, число
+        комментариев хранится в самом посте.
+        """
+        return self.select_related('author', 'group')
+
+
+class CountedModel(models.Model):
+    """
+    Модель, от которой зависят счетчики: строка и счетчики, обновляемые
+    сигналами ``post_save``, сохраняются в одной транзакции.
+    """
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class Post(CountedModel):
     text = models.TextField()
     pub_date = models.DateTimeField('date published', auto_now_add=True,
                                     db_index=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='posts')
+                               related_name='posts', db_index=False)
     group = models.ForeignKey(Group, on_delete=models.SET_NULL, blank=True,
-                              null=True, related_name='posts')
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+                              null=True, related_name='posts',
+                              db_index=False)
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=ContentAddressedStorage(),
+                              db_index=True)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Составные индексы служат и индексами внешних ключей.
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Comment(models.Model):
+class Comment(CountedModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
-                             related_name='comments')
+                             related_name='comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='comments')
     text = models.TextField()
@@ -40,22 +77,64 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created']
+        indexes = [
+            models.Index(fields=['post', 'created', 'id']),
+        ]
 
     def __str__(self):
         return self.text
 
 
-class Follow(models.Model):
+class Follow(CountedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
-                             related_name='follower')
+                             related_name='follower', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='following')
+                               related_name='following', db_index=False)
 
     class Meta:
         unique_together = ['user', 'author']
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
         constraints = [
             models.CheckConstraint(
                 name="prevent_self_follow",
                 check=~models.Q(user=models.F("author")),
             ),
         ]
+
+
+class UserCounter(models.Model):
+    """Денормализованные счетчики пользователя для шапки профиля."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='counters')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Материализованная домашняя лента: пост автора, записанный в ленту
+    каждого подписчика в момент публикации.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline', db_index=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.post}'
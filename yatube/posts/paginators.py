@@ -0,0 +1,166 @@
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 50
+COMMENT_ORDERING = ('created', 'id')
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинатор: страницы выбираются условием по индексированной паре
+    полей (по умолчанию ``pub_date``, ``id``) вместо ``COUNT(*)`` и
+    ``OFFSET``, поэтому глубокие страницы стоят столько же, сколько первая.
+
+    Страницы адресуются непрозрачными токенами ``?cursor=``. Общее число
+    страниц неизвестно: ``num_pages`` описывает только соседей текущей
+    страницы, чего достаточно для ``Page.has_next``/``has_previous``.
+    """
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.cursor = None
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._has_next = False
+        self._has_previous = False
+
+    @property
+    def num_pages(self):
+        return 1 + self._has_previous + self._has_next
+
+    @property
+    def is_cursor(self):
+        return True
+
+    def get_page(self, cursor=None):
+        """
+        Вернуть страницу по токену; пустой или испорченный токен ведет на
+        первую страницу, как ``Paginator.get_page`` с неверным номером.
+        """
+        position = self._decode(cursor) if cursor else None
+        if position is None:
+            return self._first_page()
+        direction, values = position
+        self.cursor = cursor
+        if direction == self.PREVIOUS:
+            return self._page_before(values)
+        return self._page_after(values)
+
+    def _rows(self, ordering, values=None, after=True):
+        """
+        Не больше ``per_page + 1`` строк в порядке ``ordering``: с начала
+        или строго после (до) позиции ``values``.
+        """
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._keyset(values, after))
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def _first_page(self):
+        rows = self._rows(self.ordering)
+        self._has_next = len(rows) > self.per_page
+        return self._build_page(rows[:self.per_page])
+
+    def _page_after(self, values):
+        rows = self._rows(self.ordering, values, after=True)
+        self._has_previous = True
+        self._has_next = len(rows) > self.per_page
+        return self._build_page(rows[:self.per_page])
+
+    def _page_before(self, values):
+        reverse = [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+        rows = self._rows(reverse, values, after=False)
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты: отдаем полную первую страницу.
+            self.cursor = None
+            return self._first_page()
+        self._has_previous = True
+        self._has_next = True
+        return self._build_page(rows[:self.per_page][::-1])
+
+    def _build_page(self, rows):
+        if rows and self._has_next:
+            self.next_cursor = self._encode(self.NEXT, rows[-1])
+        if rows and self._has_previous:
+            self.previous_cursor = self._encode(self.PREVIOUS, rows[0])
+        number = 2 if self._has_previous else 1
+        return self._get_page(rows, number, self)
+
+    def _keyset(self, values, after, columns=None):
+        """
+        Условие «строго после (до) позиции» для составного ключа:
+        ``a < x OR (a = x AND b < y)`` при убывающем порядке. ``columns``
+        переименовывает поля ключа для другой таблицы.
+        """
+        lookup = 'lt' if after == self.descending else 'gt'
+        columns = columns or {}
+        names = [columns.get(name, name) for name in self.fields]
+        condition = Q()
+        for index, (field, name) in enumerate(zip(self.fields, names)):
+            equal = {
+                column: values[key]
+                for key, column in zip(self.fields[:index], names)
+            }
+            condition |= Q(**equal, **{f'{name}__{lookup}': values[field]})
+        return condition
+
+    def _encode(self, direction, row):
+        raw = '|'.join(
+            [direction]
+            + [getattr(row, name).isoformat()
+               if hasattr(getattr(row, name), 'isoformat')
+               else str(getattr(row, name)) for name in self.fields]
+        )
+        return urlsafe_base64_encode(force_bytes(raw))
+
+    def _decode(self, cursor):
+        try:
+            direction, *raw_values = force_str(
+                urlsafe_base64_decode(cursor)).split('|')
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if (direction not in (self.NEXT, self.PREVIOUS)
+                or len(raw_values) != len(self.fields)):
+            return None
+        opts = self.object_list.model._meta
+        values = {}
+        for name, raw in zip(self.fields, raw_values):
+            try:
+                values[name] = opts.get_field(name).to_python(raw)
+            except ValidationError:
+                return None
+            if values[name] is None:
+                return None
+        return direction, values
+
+
+def get_page(request, queryset, per_page=POSTS_PER_PAGE):
+    """
+    Страница ленты для запроса. Старые ссылки вида ``?page=N`` по-прежнему
+    обслуживаются обычным ``Paginator``, все остальные — курсорным.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset, per_page).get_page(page_number)
+    return CursorPaginator(queryset, per_page).get_page(
+        request.GET.get('cursor'))
+
+
+def get_comments_page(request, post):
+    """Страница комментариев поста по курсору, от старых к новым."""
+    comments = post.comments.select_related('author')
+    return CursorPaginator(
+        comments, COMMENTS_PER_PAGE, ordering=COMMENT_ORDERING,
+    ).get_page(request.GET.get('cursor'))
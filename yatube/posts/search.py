@@ -0,0 +1,213 @@
+import re
+
+from django.db import connections, router
+from django.utils.html import escape
+
+from .models import Post
+
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+SNIPPET_TOKENS = 16
+REBUILD_BATCH_SIZE = 1000
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def highlight(snippet):
+    """Экранировать фрагмент и заменить маркеры совпадений на ``<mark>``."""
+    return escape(snippet).replace(
+        SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+
+class SqliteSearch:
+    """Индекс FTS5, строки которого связаны с постами через ``rowid``."""
+    table = 'posts_post_fts'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @staticmethod
+    def _match(query):
+        words = WORD_RE.findall(query)
+        return ' '.join(f'"{word}"' for word in words)
+
+    def index(self, post_id, text):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                [post_id, text])
+
+    def index_many(self, rows):
+        """Добавить в индекс новые посты: пары ``(post_id, text)``."""
+        self._insert(rows)
+
+    def remove(self, post_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+
+    def count(self, query):
+        match = self._match(query)
+        if not match:
+            return 0
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s', [match])
+            return cursor.fetchone()[0]
+
+    def search(self, query, limit, offset):
+        match = self._match(query)
+        if not match:
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({self.table}, 0, %s, %s, %s, %s) '
+                f'FROM {self.table} WHERE {self.table} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [SNIPPET_START, SNIPPET_END, '…', SNIPPET_TOKENS,
+                 match, limit, offset])
+            return cursor.fetchall()
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        posts = Post.objects.using(self.connection.alias).values_list(
+            'pk', 'text').order_by('pk')
+        batch = []
+        for row in posts.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) == REBUILD_BATCH_SIZE:
+                self._insert(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+
+    def _insert(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                rows)
+
+
+class PostgresSearch:
+    """
+    Поиск по сохраняемой вычисляемой колонке ``search_vector`` с
+    GIN-индексом: PostgreSQL сам обновляет ее при записи поста.
+    """
+    config = 'russian'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index(self, post_id, text):
+        pass
+
+    def index_many(self, rows):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def count(self, query):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM posts_post '
+                'WHERE search_vector @@ plainto_tsquery(%s, %s)',
+                [self.config, query])
+            return cursor.fetchone()[0]
+
+    def search(self, query, limit, offset):
+        options = (
+            f'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, '
+            f'MaxWords={SNIPPET_TOKENS}, MinWords=5'
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT id, ts_headline(%s, text, q, %s) '
+                'FROM posts_post, plainto_tsquery(%s, %s) AS q '
+                'WHERE search_vector @@ q '
+                'ORDER BY ts_rank(search_vector, q) DESC, pub_date DESC '
+                'LIMIT %s OFFSET %s',
+                [self.config, options, self.config, query, limit, offset])
+            return cursor.fetchall()
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('REINDEX INDEX posts_post_search_vector_idx')
+
+
+class SimpleSearch:
+    """Запасной вариант для прочих СУБД: поиск подстроки без ранжирования."""
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _queryset(self, query):
+        posts = Post.objects.using(self.connection.alias)
+        for word in WORD_RE.findall(query):
+            posts = posts.filter(text__icontains=word)
+        return posts
+
+    def index(self, post_id, text):
+        pass
+
+    def index_many(self, rows):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def count(self, query):
+        return self._queryset(query).count() if query.strip() else 0
+
+    def search(self, query, limit, offset):
+        if not query.strip():
+            return []
+        rows = self._queryset(query).values_list('pk', 'text')
+        return [
+            (pk, text[:SNIPPET_TOKENS * 8])
+            for pk, text in rows[offset:offset + limit]
+        ]
+
+    def rebuild(self):
+        pass
+
+
+BACKENDS = {
+    'sqlite': SqliteSearch,
+    'postgresql': PostgresSearch,
+}
+
+
+def get_backend(using=None):
+    using = using or router.db_for_write(Post)
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, SimpleSearch)(connection)
+
+
+class SearchResults:
+    """
+    Ленивый список результатов поиска для ``Paginator``: срез выполняет
+    один ранжированный запрос к индексу и подгружает посты для ленты.
+    """
+    def __init__(self, query, backend=None):
+        self.query = query
+        self.backend = backend or get_backend()
+
+    def count(self):
+        return self.backend.count(self.query)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults поддерживает только срезы')
+        start = index.start or 0
+        rows = self.backend.search(self.query, index.stop - start, start)
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+        results = []
+        for pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
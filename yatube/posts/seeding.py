@@ -0,0 +1,309 @@
+"""
+Генератор синтетических данных для замеров и ручной проверки на
+реалистичных объемах.
+
+Активность пользователей подчиняется степенному закону: номер в рейтинге
+популярности (``rank``) дает вес ``1 / rank ** alpha``. Так у немногих
+авторов оказываются миллионы подписчиков и тысячи постов, а у
+большинства — единицы, как в настоящих социальных графах.
+
+Строки вставляются ``bulk_create`` пачками, каждая пачка в своей
+транзакции. Сигналы при этом не срабатывают, поэтому счетчики
+пользователей и ``comments_count`` вычисляются при генерации, а в конце
+новые посты добавляются в поисковый индекс и сбрасываются закэшированные
+страницы, на которых они видны.
+"""
+import itertools
+from array import array
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import search, timeline
+from .cache import bump_feed_versions, bump_generations
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+SCALES = {
+    'tiny': {
+        'users': 50, 'groups': 5, 'posts': 500,
+        'follows': 500, 'comments': 1_000,
+    },
+    'small': {
+        'users': 2_000, 'groups': 50, 'posts': 50_000,
+        'follows': 100_000, 'comments': 100_000,
+    },
+    'full': {
+        'users': 100_000, 'groups': 1_000, 'posts': 5_000_000,
+        'follows': 20_000_000, 'comments': 10_000_000,
+    },
+}
+BATCH_SIZE = 5_000
+# UPDATE из bulk_update перебирает CASE по всем строкам пачки, поэтому
+# даты пишутся пачками поменьше.
+DATES_BATCH_SIZE = 500
+HISTORY_DAYS = 365
+GROUP_SHARE = 0.5
+WORDS = (
+    'котик', 'погода', 'работа', 'отпуск', 'книга', 'кино', 'музыка',
+    'джанго', 'питон', 'город', 'море', 'горы', 'кофе', 'поезд', 'лето',
+)
+
+
+def power_law_weights(size, alpha, rng):
+    """
+    Накопленные веса ``1 / rank ** alpha`` для ``rng.choices``. Ранги
+    перемешаны, чтобы популярность не совпадала с порядком ключей.
+    """
+    ranks = list(range(1, size + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** alpha for rank in ranks))
+
+
+def _insert(model, batch, date_field):
+    """
+    Вставить пачку и проставить ей ключи. ``auto_now_add`` перезаписывает
+    дату при вставке, поэтому сгенерированные даты ``date_field``
+    возвращаются отдельным ``UPDATE``.
+    """
+    dates = [getattr(obj, date_field) for obj in batch] if date_field else []
+    with transaction.atomic():
+        model.objects.bulk_create(batch)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # SQLite в Django 3.2 не возвращает ключи из bulk_create. Без
+            # параллельной записи пачка занимает последние ключи.
+            last = model.objects.aggregate(last=Max('pk'))['last']
+            for pk, obj in enumerate(batch, last - len(batch) + 1):
+                obj.pk = pk
+        for obj, value in zip(batch, dates):
+            setattr(obj, date_field, value)
+        if dates:
+            model.objects.bulk_update(batch, [date_field],
+                                      batch_size=DATES_BATCH_SIZE)
+
+
+def _bulk(model, objects, batch_size, date_field=None):
+    """
+    Вставить объекты пачками, каждую в своей транзакции, и вернуть их
+    первичные ключи.
+    """
+    pks = array('Q')
+    batch = []
+    for obj in itertools.chain(objects, [None]):
+        if obj is not None:
+            batch.append(obj)
+            if len(batch) < batch_size:
+                continue
+        if batch:
+            _insert(model, batch, date_field)
+            pks.extend(obj.pk for obj in batch)
+            batch = []
+    return pks
+
+
+def _chunks(values, size):
+    iterator = iter(values)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _texts(rng, words):
+    while True:
+        yield ' '.join(rng.choices(WORDS, k=words))
+
+
+class Seeder:
+    """Одна генерация: общие веса и денормализованные счетчики."""
+    def __init__(self, rng, alpha, prefix, batch_size, log):
+        self.rng = rng
+        self.alpha = alpha
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.log = log
+        self.now = timezone.now()
+
+    def weights(self, size):
+        return power_law_weights(size, self.alpha, self.rng)
+
+    def pick(self, size, cum_weights, k=1):
+        return self.rng.choices(range(size), cum_weights=cum_weights, k=k)
+
+    def users(self, count):
+        self.user_ids = _bulk(User, (
+            User(username=f'{self.prefix}{index}', password='!')
+            for index in range(count)
+        ), self.batch_size)
+        self.activity = self.weights(count)
+        self.popularity = self.weights(count)
+        self.posts_per_user = array('I', bytes(4 * count))
+        self.followers = array('I', bytes(4 * count))
+        self.following = array('I', bytes(4 * count))
+        self.log(f'Пользователи: {len(self.user_ids)}')
+
+    def groups(self, count):
+        self.group_ids = _bulk(Group, (
+            Group(title=f'Группа {self.prefix}{index}',
+                  slug=f'{self.prefix}-{index}',
+                  description='Сгенерированная группа')
+            for index in range(count)
+        ), self.batch_size)
+        self.log(f'Группы: {len(self.group_ids)}')
+
+    def _group_id(self, group_weights):
+        if not self.group_ids or self.rng.random() >= GROUP_SHARE:
+            return None
+        index = self.pick(len(self.group_ids), group_weights)[0]
+        return self.group_ids[index]
+
+    def posts(self, count, comments):
+        """
+        Посты вместе с комментариями: число комментариев к посту известно
+        заранее и сразу пишется в ``comments_count``.
+        """
+        users = len(self.user_ids)
+        authors = array('I', self.pick(users, self.activity, count))
+        for index in authors:
+            self.posts_per_user[index] += 1
+        commented = array('I', self.pick(
+            count, self.weights(count), comments) if count else [])
+        comments_per_post = array('I', bytes(4 * count))
+        for index in commented:
+            comments_per_post[index] += 1
+
+        group_weights = self.weights(len(self.group_ids))
+        history = HISTORY_DAYS * 24 * 3600
+        # Возраст поста в секундах: комментарий не старше своего поста.
+        ages = array('I', (self.rng.randrange(history) for _ in range(count)))
+        texts = _texts(self.rng, 12)
+        self.post_ids = _bulk(Post, (
+            Post(
+                text=next(texts),
+                author_id=self.user_ids[authors[index]],
+                group_id=self._group_id(group_weights),
+                pub_date=self.now - timedelta(seconds=ages[index]),
+                comments_count=comments_per_post[index],
+            )
+            for index in range(count)
+        ), self.batch_size, 'pub_date')
+        self.log(f'Посты: {len(self.post_ids)}')
+
+        texts = _texts(self.rng, 6)
+        self.comment_ids = _bulk(Comment, (
+            Comment(
+                post_id=self.post_ids[index],
+                author_id=self.user_ids[
+                    self.pick(users, self.activity)[0]],
+                text=next(texts),
+                created=self.now - timedelta(
+                    seconds=self.rng.randrange(ages[index] + 1)),
+            )
+            for index in commented
+        ), self.batch_size, 'created')
+        self.log(f'Комментарии: {len(self.comment_ids)}')
+
+    def _follow_rows(self, count):
+        """
+        Подписчик выбирается по своей активности, автор — по
+        популярности; повторы и подписки на себя отбрасываются.
+        """
+        users = len(self.user_ids)
+        wanted_by_user = {}
+        for index in self.pick(users, self.weights(users), count):
+            wanted_by_user[index] = wanted_by_user.get(index, 0) + 1
+        # Не больше половины остальных пользователей: добирать редких
+        # авторов из хвоста распределения слишком долго.
+        limit = max(1, (users - 1) // 2) if users > 1 else 0
+        for user_index, wanted in wanted_by_user.items():
+            wanted = min(wanted, limit)
+            authors = set()
+            while len(authors) < wanted:
+                authors.update(
+                    index for index in self.pick(
+                        users, self.popularity, wanted - len(authors))
+                    if index != user_index)
+            for author_index in authors:
+                self.following[user_index] += 1
+                self.followers[author_index] += 1
+                yield Follow(user_id=self.user_ids[user_index],
+                             author_id=self.user_ids[author_index])
+
+    def follows(self, count):
+        self.follow_ids = (
+            _bulk(Follow, self._follow_rows(count), self.batch_size)
+            if self.user_ids else [])
+        self.log(f'Подписки: {len(self.follow_ids)}')
+
+    def counters(self):
+        _bulk(UserCounter, (
+            UserCounter(
+                user_id=user_id,
+                posts_count=self.posts_per_user[index],
+                followers_count=self.followers[index],
+                following_count=self.following[index],
+            )
+            for index, user_id in enumerate(self.user_ids)
+        ), self.batch_size)
+
+    def timelines(self):
+        seeded = Follow.objects.filter(
+            user__username__startswith=self.prefix)
+        for user_id, author_id in seeded.values_list(
+                'user_id', 'author_id').iterator():
+            timeline.backfill(user_id, author_id)
+        self.log('Ленты подписок заполнены')
+
+    def search_index(self):
+        """Добавить в индекс только вставленные посты, пачками."""
+        backend = search.get_backend()
+        for pks in _chunks(self.post_ids, self.batch_size):
+            rows = Post.objects.filter(pk__in=pks).values_list('pk', 'text')
+            with transaction.atomic():
+                backend.index_many(list(rows))
+        self.log('Посты добавлены в поисковый индекс')
+
+    def invalidate(self):
+        """
+        Сбросить страницы главной, групп и авторов, а также ленты
+        созданных пользователей: сигналы ``bulk_create`` не отправляет.
+        """
+        scopes = itertools.chain(
+            ['index', 'groups'],
+            (f'group:{pk}' for pk in self.group_ids),
+            (f'author:{pk}' for pk in self.user_ids),
+        )
+        for batch in _chunks(scopes, self.batch_size):
+            bump_generations(*batch)
+        for batch in _chunks(self.user_ids, self.batch_size):
+            bump_feed_versions(batch)
+
+
+def seed_dataset(users, groups, posts, follows, comments, rng,
+                 alpha=1.1, prefix='seed', batch_size=BATCH_SIZE,
+                 timelines=False, log=None):
+    """
+    Создать ``users`` пользователей, ``groups`` групп, ``posts`` постов,
+    около ``follows`` подписок и ``comments`` комментариев. Возвращает
+    число созданных строк по таблицам.
+    """
+    seeder = Seeder(rng, alpha, prefix, batch_size,
+                    log or (lambda message: None))
+    seeder.users(users)
+    seeder.groups(groups)
+    seeder.posts(posts, comments)
+    seeder.follows(follows)
+    seeder.counters()
+    seeder.search_index()
+    if timelines:
+        seeder.timelines()
+    seeder.invalidate()
+    return {
+        'users': len(seeder.user_ids),
+        'groups': len(seeder.group_ids),
+        'posts': len(seeder.post_ids),
+        'comments': len(seeder.comment_ids),
+        'follows': len(seeder.follow_ids),
+    }
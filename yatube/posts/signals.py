@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search, tasks, thumbnails, timeline
+from .cache import (bump_feed_versions, bump_generations,
+                    invalidate_post_pages)
+from .counters import bump_comments_count, bump_user_counters
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounter.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk and not raw:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if previous is not None:
+            (instance._previous_group_id,
+             instance._previous_image) = previous
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user_counters(instance.author_id, posts_count=1)
+        tasks.fan_out_post.enqueue(
+            instance.pk, key=f'fan-out:post:{instance.pk}')
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_user_counters(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_changed_post_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    author_id = instance.author_id
+    group_ids = (instance.group_id,
+                 getattr(instance, '_previous_group_id', None))
+    # Сброс до фиксации позволил бы параллельному читателю сохранить
+    # старые строки под новым поколением — навсегда.
+    transaction.on_commit(
+        lambda: invalidate_post_pages(author_id, *group_ids))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    tasks.index_post.enqueue(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if not raw and previous and previous != instance.image.name:
+        thumbnails.release_image(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    thumbnails.release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author_id', 'group_id').first()
+    if post is not None:
+        transaction.on_commit(lambda: invalidate_post_pages(
+            post['author_id'], post['group_id']))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        scopes = ('groups', f'group:{instance.pk}')
+        transaction.on_commit(lambda: bump_generations(*scopes))
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user_counters(instance.user_id, following_count=1)
+        bump_user_counters(instance.author_id, followers_count=1)
+        tasks.backfill_timeline.enqueue(
+            instance.pk, key=f'backfill:follow:{instance.pk}')
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_user_counters(instance.user_id, following_count=-1)
+    bump_user_counters(instance.author_id, followers_count=-1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    if timeline.reached_fanout_limit(instance.author_id):
+        tasks.fan_out_author.enqueue(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follower_feed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user_id, author_id = instance.user_id, instance.author_id
+    transaction.on_commit(lambda: (
+        bump_feed_versions([user_id]),
+        # Счетчики подписок и кнопка подписки на страницах обоих.
+        bump_generations(f'author:{user_id}', f'author:{author_id}'),
+    ))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        scope = f'author:{instance.pk}'
+        transaction.on_commit(lambda: bump_generations(scope))
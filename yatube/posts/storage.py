@@ -0,0 +1,74 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла, прочитанного кусками."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище картинок постов, в котором имя файла — хеш его содержимого:
+    ``posts/ab/abcdef….jpg``. Одинаковые картинки занимают один файл и
+    один набор миниатюр, а повторная загрузка ничего не пишет на диск.
+
+    Файл может быть общим для нескольких постов, поэтому удаляется не
+    здесь, а через ``thumbnails.release_image``, когда на него больше
+    не ссылается ни один пост.
+
+    Уже существующий файл не перезаписывается, но его могут собирать
+    одновременно: сборщик проверил ссылки до того, как новый пост был
+    зафиксирован. Поэтому после фиксации транзакции файл проверяется еще
+    раз и при необходимости записывается заново. Сборщик, в свою очередь,
+    сначала убирает файл в сторону (``withdraw``) и перепроверяет ссылки,
+    так что пост, зафиксированный в любой момент, не останется без файла.
+    """
+    def _save(self, name, content):
+        digest = getattr(content, 'content_hash', None) or content_hash(
+            content)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        hashed_name = os.path.join(
+            directory, digest[:2], f'{digest}{extension}')
+        if self.exists(hashed_name):
+            transaction.on_commit(
+                lambda: self._ensure(hashed_name, content))
+            return hashed_name
+        return self._ensure(hashed_name, content)
+
+    def _ensure(self, hashed_name, content):
+        if self.exists(hashed_name):
+            return hashed_name
+        content.seek(0)
+        saved_name = super()._save(hashed_name, content)
+        if saved_name != hashed_name:
+            # Тот же файл одновременно сохранил другой запрос.
+            self.delete(saved_name)
+        return hashed_name
+
+    def withdraw(self, name):
+        """
+        Переименовать файл перед удалением и вернуть временное имя.
+        ``FileNotFoundError``, если файла уже нет.
+        """
+        hidden = f'{name}.{uuid.uuid4().hex}.collecting'
+        os.replace(self.path(name), self.path(hidden))
+        return hidden
+
+    def restore(self, hidden, name):
+        """Вернуть файл, убранный ``withdraw``: на него снова ссылаются."""
+        os.replace(self.path(hidden), self.path(name))
@@ -0,0 +1,51 @@
+"""
+Тяжелые побочные эффекты записей, которые выполняются очередью задач.
+Каждая задача перечитывает объект из базы: к моменту выполнения его
+могли изменить или удалить.
+"""
+from tasks.queue import task
+
+from . import search, timeline
+from .cache import bump_feed_versions, bump_followers_feeds
+from .models import Follow, Post
+
+
+@task
+def fan_out_post(post_id):
+    """Разложить новый пост по лентам подписчиков и сбросить их кэш."""
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'pub_date').first()
+    if post is None:
+        return
+    timeline.fan_out(post)
+    bump_followers_feeds(post.author_id)
+
+
+@task
+def backfill_timeline(follow_id):
+    """Добавить в ленту подписчика последние посты автора."""
+    follow = Follow.objects.filter(pk=follow_id).values_list(
+        'user_id', 'author_id').first()
+    if follow is None:
+        return
+    user_id, author_id = follow
+    timeline.backfill(user_id, author_id)
+    bump_feed_versions([user_id])
+
+
+@task
+def fan_out_author(author_id):
+    """
+    Автор опустился до порога раскладки: его посты больше не подмешиваются
+    при чтении и должны лежать в лентах подписчиков.
+    """
+    timeline.fan_out_author(author_id)
+    bump_followers_feeds(author_id)
+
+
+@task
+def index_post(post_id):
+    text = Post.objects.filter(pk=post_id).values_list(
+        'text', flat=True).first()
+    if text is not None:
+        search.get_backend().index(post_id, text)
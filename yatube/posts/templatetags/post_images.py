@@ -0,0 +1,10 @@
+from django import template
+
+from posts.thumbnails import ready_thumbnail as get_ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image):
+    return get_ready_thumbnail(image.name if image else None)
@@ -0,0 +1,104 @@
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class PostsApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='AndreyG')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-slug', description='Описание')
+        for i in range(POSTS_PER_PAGE + 2):
+            cls.post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_paginate_by_cursor(self):
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_posts', args=['api-slug']),
+            reverse('api:profile', args=['AndreyG']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), POSTS_PER_PAGE)
+                self.assertEqual(data['results'][0]['text'], 'Пост 11')
+                self.assertIsNone(data['previous'])
+                following = self.client.get(
+                    url, {'cursor': data['next']}).json()
+                self.assertEqual(
+                    [post['text'] for post in following['results']],
+                    ['Пост 1', 'Пост 0'])
+
+    def test_objects(self):
+        data = self.client.get(
+            reverse('api:profile', args=['AndreyG'])).json()
+        self.assertEqual(data['author']['posts_count'], POSTS_PER_PAGE + 2)
+        self.assertEqual(data['author']['followers_count'], 1)
+        data = self.client.get(
+            reverse('api:post', args=['AndreyG', self.post.pk])).json()
+        self.assertEqual(data['group'], 'api-slug')
+        self.assertEqual(data['comments_count'], 1)
+        data = self.client.get(
+            reverse('api:post_comments', args=['AndreyG', self.post.pk])
+        ).json()
+        self.assertEqual(data['results'][0]['author'], 'Reader')
+
+    def test_fields_projection(self):
+        data = self.client.get(
+            reverse('api:index'), {'fields': 'id,author'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        response = self.client.get(reverse('api:index'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['detail'])
+
+    def test_query_budget_matches_html(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:index'))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('api:profile', args=['AndreyG']))
+
+    def test_etag_and_gzip(self):
+        url = reverse('api:index')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), POSTS_PER_PAGE)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.reader_client.get(url)
+        self.assertEqual(len(response.json()['results']), POSTS_PER_PAGE)
+        response = self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Свежий', author=self.author)
+        response = self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['results'][0]['text'], 'Свежий')
+
+    def test_not_found_is_json(self):
+        response = self.client.get(reverse('api:profile', args=['nobody']))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Не найдено'})
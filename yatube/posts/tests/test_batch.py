@@ -0,0 +1,134 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..batch import import_rows
+from ..models import Follow, Group, Post, UserCounter
+from ..search import SearchResults
+from ..timeline import home_timeline
+
+User = get_user_model()
+
+
+def ndjson(*rows):
+    return '\n'.join(
+        row if isinstance(row, str) else json.dumps(row) for row in rows)
+
+
+class BatchImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='AndreyG')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='batch-slug', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def post_batch(self, kind, body, client=None):
+        return (client or self.author_client).post(
+            reverse(f'api:batch_{kind}'), body,
+            content_type='application/x-ndjson')
+
+    def _counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_posts_import_reports_row_errors(self):
+        response = self.post_batch('posts', ndjson(
+            {'text': 'Первый', 'group': self.group.pk},
+            {'text': ''},
+            'не json',
+            {'text': 'Чужая группа', 'group': 999},
+            {'text': 'Второй'},
+        ))
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(
+            [(error['line'], sorted(error['errors']))
+             for error in result['errors']],
+            [(2, ['text']), (3, ['__all__']), (4, ['group'])])
+        self.assertEqual(
+            set(Post.objects.values_list('text', 'group')),
+            {('Первый', self.group.pk), ('Второй', None)})
+
+    def test_posts_import_reapplies_side_effects(self):
+        result = import_rows('posts', [
+            json.dumps({'text': f'Пакетный пост {i}'}) for i in range(5)
+        ], user=self.author, chunk_size=2)
+        self.assertEqual(result, {'created': 5, 'errors': []})
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(self._counters(self.author).posts_count, 5)
+        self.assertEqual(SearchResults('пакетный').count(), 5)
+        self.assertEqual(set(home_timeline(self.reader)), set(posts))
+
+    def test_untrusted_rows_cannot_set_author(self):
+        response = self.post_batch('posts', ndjson(
+            {'text': 'От чужого имени', 'author': 'Reader'},
+            {'text': 'Задним числом', 'pub_date': '2001-01-01T00:00:00'},
+        ))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [list(error['errors']) for error in response.json()['errors']],
+            [['author'], ['pub_date']])
+        self.assertFalse(Post.objects.exists())
+
+    def test_anonymous_is_rejected(self):
+        response = self.post_batch('posts', ndjson({'text': 'Текст'}),
+                                   client=Client())
+        self.assertEqual(response.status_code, 401)
+
+    def test_comments_import_updates_comments_count(self):
+        post = Post.objects.create(text='Пост', author=self.reader)
+        response = self.post_batch('comments', ndjson(
+            {'post': post.pk, 'text': 'Один'},
+            {'post': post.pk, 'text': 'Два'},
+            {'post': 999, 'text': 'Мимо'},
+        ))
+        self.assertEqual(response.json()['created'], 2)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(
+            list(post.comments.values_list('author', flat=True)),
+            [self.author.pk, self.author.pk])
+
+    def test_follows_import_counts_and_backfills(self):
+        post = Post.objects.create(text='Пост', author=self.reader)
+        response = self.post_batch('follows', ndjson(
+            {'author': 'Reader'},
+            {'author': 'Reader'},
+            {'author': 'AndreyG'},
+            {'author': 'Nobody'},
+        ))
+        result = response.json()
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['line'] for error in result['errors']],
+                         [2, 3, 4])
+        self.assertEqual(self._counters(self.author).following_count, 1)
+        self.assertEqual(self._counters(self.reader).followers_count, 1)
+        self.assertEqual(list(home_timeline(self.author)), [post])
+
+    def test_command_imports_trusted_rows(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as source:
+            source.write(ndjson(
+                {'text': 'Архив', 'author': 'Reader',
+                 'pub_date': '2001-01-01T00:00:00+00:00'},
+                {'text': 'Без автора'},
+            ))
+            source.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_ndjson', 'posts', source.name,
+                         stdout=out, stderr=err)
+        self.assertIn('Создано: 1', out.getvalue())
+        self.assertIn('Строка 2', err.getvalue())
+        post = Post.objects.get()
+        self.assertEqual(post.author, self.reader)
+        self.assertEqual(post.pub_date.year, 2001)
@@ -0,0 +1,37 @@
+import random
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import benchmark
+from ..seeding import seed_dataset
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_drivers_measure_every_request(self):
+        seed_dataset(users=5, groups=1, posts=20, follows=5, comments=5,
+                     rng=random.Random(2))
+        paths = [reverse('index')]
+        client_result = benchmark.measure_client(Client(), paths, 3)
+        wsgi_result = benchmark.measure_wsgi(WSGIHandler(), paths, '', 3, 1)
+        for result in (client_result, wsgi_result):
+            with self.subTest(result=result):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['statuses'], [200])
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(client_result['max_queries'], 0)
+
+    def test_compare_reports_slower_pages(self):
+        def report(p50):
+            timing = {'p50_ms': p50, 'p99_ms': 10.0}
+            return {'results': [
+                {'name': 'index', 'client': timing, 'wsgi': timing}]}
+        self.assertEqual(benchmark.compare(report(5.0), report(5.2)), [])
+        lines = benchmark.compare(report(5.0), report(8.0))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('index client p50_ms'))
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='AndreyG')
+        self.reader = User.objects.create_user(username='DaBaby')
+
+    def _counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_post_counter_follows_saves_and_deletes(self):
+        post = Post.objects.create(text='Текст', author=self.author)
+        Post.objects.create(text='Еще текст', author=self.author)
+        self.assertEqual(self._counters(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self._counters(self.author).posts_count, 1)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self._counters(self.author).followers_count, 1)
+        self.assertEqual(self._counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self._counters(self.author).followers_count, 0)
+        self.assertEqual(self._counters(self.reader).following_count, 0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(text='Текст', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        post = Post.objects.create(text='Текст', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounter.objects.filter(user=self.author).update(
+            posts_count=42, followers_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        UserCounter.objects.filter(user=self.reader).delete()
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+
+        self.assertIn('пользователей: 2, постов: 1', out.getvalue())
+        self.assertEqual(self._counters(self.author).posts_count, 1)
+        self.assertEqual(self._counters(self.author).followers_count, 1)
+        self.assertEqual(self._counters(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_profile_header_shows_counters(self):
+        Post.objects.create(text='Текст', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(
+            reverse('profile', kwargs={'username': 'AndreyG'}))
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Подписан: 0')
+        self.assertContains(response, 'Записей: 1')
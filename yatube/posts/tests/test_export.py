@@ -0,0 +1,103 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import export
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='AndreyG')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export-slug', description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+            for i in range(5)
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.author,
+                               text='Свой комментарий')
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Чужой комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def download(self, kind, client=None, **params):
+        return (client or self.author_client).get(
+            reverse('api:export', args=['AndreyG', kind]), params)
+
+    def test_posts_stream_as_ndjson(self):
+        response = self.download('posts')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(rows[1]['group'], self.group.pk)
+        self.assertEqual(rows[1]['author'], 'AndreyG')
+
+    def test_chunks_join_lines(self):
+        export.CHUNK_SIZE, size = 2, export.CHUNK_SIZE
+        try:
+            chunks = list(export.export_lines('posts', self.author))
+        finally:
+            export.CHUNK_SIZE = size
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [2, 2, 1])
+
+    def test_comments_and_follows_as_csv(self):
+        response = self.download('comments', format='csv')
+        rows = list(csv.reader(
+            b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'post', 'text', 'author',
+                                   'created'])
+        self.assertEqual([row[2] for row in rows[1:]], ['Свой комментарий'])
+
+        response = self.download('follows', format='csv')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['user,author', 'Reader,AndreyG'])
+
+    def test_only_owner_or_staff_can_export(self):
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        self.assertEqual(
+            self.download('posts', client=reader_client).status_code, 403)
+        self.assertEqual(self.download('posts', client=Client()).status_code,
+                         401)
+        self.assertEqual(self.download('likes').status_code, 404)
+        self.assertEqual(self.download('posts', format='xml').status_code,
+                         400)
+
+    def test_command_export_imports_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson')
+            call_command('export_user', 'AndreyG', 'posts', output=path)
+            Post.objects.all().delete()
+            call_command('import_ndjson', 'posts', path, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'group', 'author', 'pub_date')),
+            [(post.text, post.group_id, self.author.pk, post.pub_date)
+             for post in self.posts])
+
+    def test_command_writes_stdout(self):
+        out = StringIO()
+        call_command('export_user', 'Reader', 'follows', stdout=out)
+        self.assertEqual(json.loads(out.getvalue()),
+                         {'user': 'Reader', 'author': 'AndreyG'})
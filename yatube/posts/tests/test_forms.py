@@ -84,11 +84,11 @@ class PostCreateFormTests(TestCase):
             'Типичный текст': post_obj.text,
             self.group.id: post_obj.group.id,
             self.test_user: post_obj.author,
-            'posts/small.gif': post_obj.image.name
         }
         for value, expected in fields.items():
             with self.subTest(value=value):
                 self.assertEqual(value, expected)
+        self.assertRegex(post_obj.image.name, r'^posts/\w\w/\w{64}\.gif$')
 
     def test_edit_post(self):
         """Валидная форма меняет запись в Post."""
@@ -0,0 +1,101 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..paginators import CursorPaginator
+from ..timeline import TimelinePaginator
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса SQLite')
+class FeedQueryPlanTest(TestCase):
+    """
+    Ленты читаются по индексу в нужном порядке: в плане нет временного
+    B-дерева, которым SQLite сортирует строки.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='AndreyG')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plan-slug', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for index in range(15):
+            post = Post.objects.create(
+                text=f'Текст {index}', author=cls.author, group=cls.group)
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Комментарий')
+        cls.post = post
+
+    def assertUsesIndex(self, queryset, index_prefix):
+        plan = queryset.explain()
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertIn(index_prefix, plan)
+
+    def feed_pages(self, queryset):
+        """Первая и следующая страница курсорного пагинатора."""
+        paginator = CursorPaginator(queryset, 10)
+        first = paginator.object_list[:11]
+        values = {'pub_date': self.post.pub_date, 'id': self.post.pk}
+        following = paginator.object_list.filter(
+            paginator._keyset(values, after=True))[:11]
+        return first, following
+
+    def test_profile_feed(self):
+        for queryset in self.feed_pages(
+                Post.objects.for_feed().filter(author=self.author)):
+            with self.subTest(query=str(queryset.query)):
+                self.assertUsesIndex(queryset, 'posts_post_author_')
+
+    def test_group_feed(self):
+        for queryset in self.feed_pages(
+                Post.objects.for_feed().filter(group=self.group)):
+            with self.subTest(query=str(queryset.query)):
+                self.assertUsesIndex(queryset, 'posts_post_group_')
+
+    def test_index_feed(self):
+        for queryset in self.feed_pages(Post.objects.for_feed()):
+            with self.subTest(query=str(queryset.query)):
+                self.assertUsesIndex(queryset, 'pub_date')
+
+    def test_post_comments(self):
+        self.assertUsesIndex(
+            Comment.objects.filter(post=self.post).order_by('created'),
+            'posts_comme_post_id_')
+
+    def test_followers_of_author(self):
+        self.assertUsesIndex(
+            Follow.objects.filter(author=self.author).values('user_id'),
+            'posts_follo_author_')
+
+    def test_follow_feed(self):
+        """
+        Записи ленты читаются по индексу без сортировки, а страница ленты
+        не просматривает таблицы целиком: сортируются только строки из
+        ограниченных подзапросов.
+        """
+        values = {'pub_date': self.post.pub_date, 'post_id': self.post.pk}
+        entries = TimelineEntry.objects.filter(user=self.reader).order_by(
+            '-pub_date', '-post_id')
+        for queryset in (entries[:11], entries.filter(
+                CursorPaginator(entries, 10, ('-pub_date', '-post_id'))
+                ._keyset(values, after=True))[:11]):
+            with self.subTest(query=str(queryset.query)):
+                self.assertUsesIndex(queryset, 'posts_timel_user_id_')
+
+        first = TimelinePaginator(self.reader, 10)
+        first.get_page()
+        for cursor in (None, first.next_cursor):
+            with CaptureQueriesContext(connection) as queries:
+                list(TimelinePaginator(self.reader, 10).get_page(cursor))
+            with connection.cursor() as db:
+                db.execute(f'EXPLAIN QUERY PLAN {queries[0]["sql"]}')
+                plan = '\n'.join(row[-1] for row in db.fetchall())
+            with self.subTest(cursor=cursor):
+                self.assertIn('posts_timel_user_id_', plan)
+                self.assertNotIn('SCAN', plan)
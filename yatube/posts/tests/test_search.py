@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SearchResults
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='AndreyG')
+        cls.post = Post.objects.create(
+            text='Утренняя пробежка по набережной <b>реки</b>',
+            author=cls.user,
+        )
+        Post.objects.create(text='Вечерний чай на веранде', author=cls.user)
+
+    def test_search_finds_ranked_posts_with_snippet(self):
+        response = self.client.get(reverse('search'), {'q': 'пробежка'})
+        page = response.context['page']
+        self.assertEqual(list(page), [self.post])
+        self.assertIn('<mark>пробежка</mark>', page[0].snippet)
+        self.assertIn('&lt;b&gt;', page[0].snippet)
+        self.assertTemplateUsed(response, 'posts/search.html')
+
+    def test_index_follows_saves_and_deletes(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Велосипедная прогулка'
+        post.save()
+        self.assertEqual(SearchResults('пробежка').count(), 0)
+        self.assertEqual(SearchResults('велосипедная').count(), 1)
+        post.delete()
+        self.assertEqual(SearchResults('велосипедная').count(), 0)
+
+    def test_search_is_paginated(self):
+        Post.objects.bulk_create([
+            Post(text=f'Заметка про чай номер {i}', author=self.user)
+            for i in range(12)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('search'), {'q': 'чай'})
+        page = response.context['page']
+        self.assertEqual(page.paginator.count, 13)
+        self.assertEqual(len(page), 10)
+        self.assertContains(response, '?q=%D1%87%D0%B0%D0%B9&amp;page=2')
+
+    def test_empty_and_symbolic_queries(self):
+        for query in ('', '"*)(', 'несуществующееслово'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.context['page'])
+
+    def test_sqlite_uses_fts5_table(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 есть только в SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM posts_post_fts')
+            self.assertEqual(cursor.fetchone()[0], 2)
@@ -0,0 +1,93 @@
+import random
+import statistics
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F, Max, Min
+from django.test import TestCase
+from django.urls import reverse
+
+from ..counters import reconcile_counters
+from ..models import Comment, Follow, Group, Post, User, UserCounter
+from ..search import SearchResults
+from ..seeding import power_law_weights
+
+
+class SeedCommandTest(TestCase):
+    def seed(self, **options):
+        options = {
+            'users': 100, 'groups': 5, 'posts': 400, 'follows': 600,
+            'comments': 400, 'stdout': StringIO(), **options,
+        }
+        call_command('seed', **options)
+
+    def test_seed_creates_requested_rows(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 100)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertTrue(0 < Follow.objects.count() <= 600)
+        self.assertEqual(UserCounter.objects.count(), 100)
+
+    def test_denormalized_fields_match_tables(self):
+        """Счетчики посчитаны при генерации и не требуют сверки."""
+        self.seed(batch_size=97)
+        self.assertEqual(reconcile_counters(), (0, 0))
+
+    def test_followers_follow_power_law(self):
+        self.seed()
+        followers = sorted(UserCounter.objects.values_list(
+            'followers_count', flat=True))
+        self.assertGreater(followers[-1], 5 * statistics.median(followers))
+
+    def test_same_seed_gives_same_data(self):
+        self.seed(seed=7)
+        first = list(Post.objects.order_by('pk').values_list(
+            'author__username', 'text'))
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed(seed=7)
+        second = list(Post.objects.order_by('pk').values_list(
+            'author__username', 'text'))
+        self.assertEqual(first, second)
+
+    def test_dates_span_history(self):
+        """Даты из генерации не перезаписываются ``auto_now_add``."""
+        self.seed(batch_size=97)
+        dates = Post.objects.aggregate(
+            first=Min('pub_date'), last=Max('pub_date'))
+        self.assertGreater(dates['last'] - dates['first'], timedelta(days=1))
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+
+    def test_seeded_posts_are_indexed(self):
+        """В индекс попадают только новые посты, без перестроения."""
+        author = User.objects.create_user(username='AndreyG')
+        Post.objects.bulk_create([Post(text='Котик вне индекса',
+                                       author=author)])
+        self.seed()
+        self.assertEqual(SearchResults('котик').count(),
+                         Post.objects.filter(text__contains='котик').count())
+        self.assertEqual(SearchResults('Котик вне индекса').count(), 0)
+
+    def test_seed_resets_cached_pages(self):
+        cache.clear()
+        self.client.get(reverse('index'))
+        self.seed()
+        newest = Post.objects.for_feed().first()
+        self.assertContains(self.client.get(reverse('index')), newest.text)
+
+    def test_existing_prefix_is_rejected(self):
+        self.seed(users=5, posts=5, follows=5, comments=5)
+        with self.assertRaises(CommandError):
+            self.seed(users=5, posts=5, follows=5, comments=5)
+
+    def test_power_law_weights_are_cumulative(self):
+        weights = power_law_weights(100, 1.1, random.Random(1))
+        self.assertEqual(len(weights), 100)
+        self.assertEqual(weights, sorted(weights))
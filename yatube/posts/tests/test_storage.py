@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..thumbnails import collect_image, ready_thumbnail
+
+User = get_user_model()
+
+
+def make_png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (30, 30), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='AndreyG')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, content, text='Мем'):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('new_post'), {
+                'text': text,
+                'image': SimpleUploadedFile('meme.png', content, 'image/png'),
+            })
+        return Post.objects.filter(text=text).latest('pk')
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые картинки делят файл и готовые миниатюры."""
+        first = self.upload(make_png('red'), 'Первый')
+        ready = ready_thumbnail(first.image.name)
+        second = self.upload(make_png('red'), 'Второй')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(ready_thumbnail(second.image.name), ready)
+        _, files = default_storage.listdir(
+            first.image.name.rsplit('/', 1)[0])
+        self.assertEqual(len(files), 1)
+
+    def test_file_is_collected_with_last_reference(self):
+        first = self.upload(make_png('green'), 'Первый')
+        second = self.upload(make_png('green'), 'Второй')
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertIsNone(ready_thumbnail(name))
+
+    def test_replaced_image_is_collected(self):
+        post = self.upload(make_png('blue'))
+        old_name = post.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('post_edit', args=[self.user.username, post.pk]),
+                {
+                    'text': post.text,
+                    'image': SimpleUploadedFile(
+                        'new.png', make_png('white'), 'image/png'),
+                })
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    def test_file_collected_before_commit_is_written_again(self):
+        first = self.upload(make_png('black'), 'Первый')
+        name = first.image.name
+        storage = Post._meta.get_field('image').storage
+        with self.captureOnCommitCallbacks() as callbacks:
+            # Новый пост сохраняет ту же картинку, пока сборщик удаляет
+            # файл старого: файл уже есть, и он не перезаписывается.
+            self.assertEqual(
+                storage.save('posts/meme.png', ContentFile(
+                    make_png('black'))), name)
+            Post.objects.filter(pk=first.pk).delete()
+            self.assertTrue(collect_image(name))
+            Post.objects.create(text='Второй', author=self.user, image=name)
+        self.assertFalse(storage.exists(name))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(storage.exists(name))
+        with storage.open(name) as file:
+            self.assertEqual(file.read(), make_png('black'))
@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from tasks.models import Task
+
+from ..models import Post
+from ..thumbnails import (delete_thumbnail, generate_thumbnail,
+                          ready_thumbnail)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='AndreyG')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def _upload(self):
+        return SimpleUploadedFile(
+            name='small.gif', content=SMALL_GIF, content_type='image/gif')
+
+    def test_new_post_schedules_thumbnail_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.authorized_client.post(reverse('new_post'), {
+                'text': 'Пост с картинкой',
+                'image': self._upload(),
+            })
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertIsNone(ready_thumbnail(post.image.name))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, post.image.url)
+
+        for callback in callbacks:
+            callback()
+        thumbnail = ready_thumbnail(post.image.name)
+        self.assertEqual((thumbnail['width'], thumbnail['height']),
+                         (480, 170))
+        self.assertContains(self.client.get(reverse('index')),
+                            thumbnail['url'])
+
+    def test_warm_command_creates_missing_thumbnails(self):
+        post = Post.objects.create(
+            text='Старый пост', author=self.user, image=self._upload())
+        delete_thumbnail(post.image.name)
+        out = StringIO()
+        call_command('warm_thumbnails', stdout=out)
+        self.assertIn('Создано миниатюр: 1', out.getvalue())
+        self.assertIsNotNone(ready_thumbnail(post.image.name))
+
+    def test_variants_survive_cache_clear(self):
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=self._upload())
+        variants = generate_thumbnail(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(ready_thumbnail(post.image.name), variants)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_lost_variants_are_queued_again(self):
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=self._upload())
+        name = post.image.name
+        # Варианты пропали, например с диском, а задача осталась.
+        delete_thumbnail(name)
+        Task.objects.create(
+            key=f'thumbnail:{name}', name=generate_thumbnail.task_name,
+            status=Task.DONE, max_attempts=3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(ready_thumbnail(name))
+        self.assertEqual(
+            Task.objects.get(key=f'thumbnail:{name}').status, Task.QUEUED)
+        with self.assertNumQueries(0):
+            self.assertIsNone(ready_thumbnail(name))
+
+    def test_responsive_variants_in_modern_formats(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 500), 'red').save(buffer, 'PNG')
+        post = Post.objects.create(
+            text='Широкая картинка',
+            author=self.user,
+            image=SimpleUploadedFile('wide.png', buffer.getvalue()),
+        )
+        variants = generate_thumbnail(post.image.name)
+
+        self.assertEqual(variants['width'], 960)
+        self.assertTrue(variants['url'].endswith('/960.jpg'))
+        self.assertIn('480w', variants['srcset'])
+        self.assertNotIn('1440w', variants['srcset'])
+        webp = [source for source in variants['sources']
+                if source['type'] == 'image/webp']
+        self.assertEqual(len(webp), 1)
+        self.assertIn('/960.webp 960w', webp[0]['srcset'])
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, f'srcset="{variants["srcset"]}"')
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import TimelinePaginator, home_timeline
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='Reader')
+        self.author = User.objects.create_user(username='AndreyG')
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(home_timeline(self.reader)), [post])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        posts = [
+            Post.objects.create(text=f'Текст {i}', author=self.author)
+            for i in range(3)
+        ]
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(set(home_timeline(self.reader)), set(posts))
+        follow.delete()
+        self.assertFalse(home_timeline(self.reader).exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_timeline_is_trimmed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Текст {i}', author=self.author)
+            for i in range(4)
+        ]
+        self.assertEqual(
+            list(home_timeline(self.reader)), [posts[3], posts[2]])
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_is_read_on_demand(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(home_timeline(self.reader)), [post])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_below_limit_is_fanned_out(self):
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow = Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        follow.delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(home_timeline(self.reader)), [post])
+
+
+@override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+class TimelinePaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='Reader')
+        other = User.objects.create_user(username='Other')
+        fanned_out = User.objects.create_user(username='AndreyG')
+        popular = User.objects.create_user(username='Popular')
+        Follow.objects.create(user=cls.reader, author=fanned_out)
+        Follow.objects.create(user=cls.reader, author=popular)
+        Follow.objects.create(user=other, author=popular)
+        for i in range(7):
+            Post.objects.create(text=f'Текст {i}',
+                                author=(fanned_out, popular)[i % 2])
+        cls.feed = list(home_timeline(cls.reader).order_by('-pub_date', '-id'))
+
+    def test_pages_merge_entries_and_read_time_posts(self):
+        self.assertEqual(TimelineEntry.objects.count(), 4)
+        paginator = TimelinePaginator(self.reader, 3)
+        pages = [list(paginator.get_page())]
+        while paginator.next_cursor:
+            cursor = paginator.next_cursor
+            paginator = TimelinePaginator(self.reader, 3)
+            pages.append(list(paginator.get_page(cursor)))
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.feed)
+
+        previous = TimelinePaginator(self.reader, 3).get_page(
+            paginator.previous_cursor)
+        self.assertEqual(list(previous), pages[1])
+
+    def test_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            list(TimelinePaginator(self.reader, 3).get_page())
@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, PngImagePlugin
+
+from ..models import Post
+from ..uploadhandlers import (BoundedImageUploadHandler, JpegMetadataFilter,
+                              PngMetadataFilter)
+
+User = get_user_model()
+
+
+def make_jpeg(size=(40, 20), orientation=6):
+    exif = Image.Exif()
+    exif[0x0110] = 'Secret Camera'
+    exif[0x0112] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+def make_png(size=(20, 20)):
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Comment', 'secret')
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, 'PNG', pnginfo=info)
+    return buffer.getvalue()
+
+
+def run_filter(metadata_filter, data, chunk_size=1):
+    output = [
+        metadata_filter.feed(data[start:start + chunk_size])
+        for start in range(0, len(data), chunk_size)
+    ]
+    return b''.join(output) + metadata_filter.flush()
+
+
+class MetadataFilterTest(TestCase):
+    def test_jpeg_filter_keeps_only_orientation(self):
+        """Из JPEG пропадают данные EXIF, кроме поворота кадра."""
+        data = run_filter(JpegMetadataFilter(), make_jpeg())
+        image = Image.open(BytesIO(data))
+        self.assertNotIn(0x0110, image.getexif())
+        self.assertEqual(image.getexif()[0x0112], 6)
+        self.assertEqual(image.size, (40, 20))
+        image.load()
+
+    def test_jpeg_without_rotation_has_no_exif(self):
+        data = run_filter(JpegMetadataFilter(), make_jpeg(orientation=1))
+        self.assertNotIn(b'Exif', data)
+
+    def test_png_filter_drops_text_chunks(self):
+        data = run_filter(PngMetadataFilter(), make_png(), chunk_size=7)
+        self.assertNotIn(b'secret', data)
+        image = Image.open(BytesIO(data))
+        image.load()
+        self.assertEqual(image.size, (20, 20))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BoundedUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='AndreyG')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post_image(self, content, name='photo.jpg'):
+        return self.client.post(reverse('new_post'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+        })
+
+    def test_upload_is_saved_without_metadata(self):
+        response = self.post_image(make_jpeg())
+        self.assertRedirects(response, reverse('index'))
+        post = Post.objects.get()
+        with post.image.open('rb') as image_file:
+            data = image_file.read()
+        self.assertNotIn(b'Secret Camera', data)
+        self.assertEqual(post.image.width, 40)
+
+    def test_upload_is_buffered_next_to_media(self):
+        """Временный файл создается в MEDIA_ROOT, чтобы его перенести."""
+        temp_dir = os.path.join(settings.MEDIA_ROOT, '.uploads')
+        with override_settings(FILE_UPLOAD_TEMP_DIR=temp_dir):
+            handler = BoundedImageUploadHandler(RequestFactory().post('/'))
+            handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        self.assertEqual(
+            os.path.dirname(handler.file.temporary_file_path()), temp_dir)
+        handler.file.close()
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_too_large_file_is_rejected(self):
+        response = self.post_image(make_jpeg())
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('не должен превышать',
+                      response.context['form'].errors['image'][0])
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_are_rejected(self):
+        response = self.post_image(make_jpeg())
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('слишком большая',
+                      response.context['form'].errors['image'][0])
+
+    def test_not_an_image_is_rejected(self):
+        response = self.post_image(b'not an image at all', 'notes.txt')
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(response.context['form'].errors['image'])
+
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('new_post'), {'text': 'Текст'})
+        self.assertEqual(response.status_code, 403)
@@ -6,10 +6,13 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..cache import feed_version, generation, page_cache_timeout
+from ..models import Comment, Follow, Group, Post
+from ..paginators import COMMENTS_PER_PAGE
 
 User = get_user_model()
 
@@ -159,16 +162,65 @@ class PostGroupPagesTests(TestCase):
     def test_index_use_cache_appropriately(self):
         """Страница index использует кэш правильно."""
         initial_response = self.guest_client.get(reverse('index'))
-        Post.objects.create(
-            text='Условный текст',
-            author=self.another_user
-        )
+        Post.objects.filter(pk=self.post.pk).update(text='Правка без сигналов')
         cached_response = self.guest_client.get(reverse('index'))
-        cache.clear()
-        non_cached_response = self.guest_client.get(reverse('index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                text='Условный текст',
+                author=self.another_user
+            )
+        invalidated_response = self.guest_client.get(reverse('index'))
         self.assertEqual(initial_response.content, cached_response.content)
-        self.assertNotEqual(initial_response.content,
-                            non_cached_response.content)
+        self.assertContains(invalidated_response, 'Условный текст')
+        self.assertContains(invalidated_response, 'Правка без сигналов')
+
+    def test_group_and_profile_pages_invalidated_by_generation(self):
+        """Страницы группы и профиля кэшируются до изменения их постов."""
+        urls = (
+            reverse('group_posts', kwargs={'slug': 'some-slug'}),
+            reverse('profile', kwargs={'username': self.username}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Правка без сигналов')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.guest_client.get(url), 'Правка без сигналов')
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                text='Новый пост группы',
+                author=self.test_user,
+                group=self.group
+            )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Новый пост группы')
+                self.assertContains(response, 'Правка без сигналов')
+
+    def test_generation_changes_after_commit(self):
+        """
+        Поколение меняется только после фиксации: иначе параллельный
+        читатель сохранил бы под ним страницу без нового поста.
+        """
+        scopes = ('index', 'groups', f'group:{self.group.pk}',
+                  f'author:{self.test_user.pk}')
+        before = generation(*scopes)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Post.objects.create(text='Новый пост группы',
+                                    author=self.test_user, group=self.group)
+                self.group.save()
+                self.test_user.save()
+            self.assertEqual(generation(*scopes), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(generation(*scopes), before)
+
+    def test_local_cache_fragments_expire(self):
+        """Смену поколения в памяти процесса другие воркеры не видят."""
+        self.assertIsNotNone(page_cache_timeout())
 
 
 class FollowViewsTest(TestCase):
@@ -254,6 +306,9 @@ class PaginatorViewsTest(TestCase):
             for i in range(1, 14)
         ])
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         response = self.client.get(reverse('index'))
         self.assertEqual(len(response.context.get('page').object_list), 10)
@@ -261,3 +316,292 @@ class PaginatorViewsTest(TestCase):
     def test_second_page_contains_three_records(self):
         response = self.client.get(reverse('index') + '?page=2')
         self.assertEqual(len(response.context.get('page').object_list), 3)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсорные ссылки ведут на следующую и предыдущую страницы."""
+        first_page = self.client.get(reverse('index')).context['page']
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+
+        next_cursor = first_page.paginator.next_cursor
+        second_page = self.client.get(
+            reverse('index') + f'?cursor={next_cursor}').context['page']
+        self.assertEqual(len(second_page.object_list), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list))
+
+        previous_cursor = second_page.paginator.previous_cursor
+        back_page = self.client.get(
+            reverse('index') + f'?cursor={previous_cursor}').context['page']
+        self.assertEqual(back_page.object_list, first_page.object_list)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('index') + '?cursor=garbage')
+        self.assertEqual(len(response.context['page'].object_list), 10)
+        self.assertFalse(response.context['page'].has_previous())
+
+
+class FeedQueryBudgetTest(TestCase):
+    """Число запросов на страницу ленты не зависит от числа постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='budget-slug',
+            description='Описание'
+        )
+        cls.reader = User.objects.create_user(username='Reader')
+        for i in range(3):
+            author = User.objects.create_user(username=f'Author{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            for j in range(5):
+                post = Post.objects.create(
+                    text=f'Текст {i}-{j}',
+                    author=author,
+                    group=cls.group
+                )
+                Comment.objects.create(
+                    post=post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feed_pages_query_budget(self):
+        budgets = (
+            (self.client, reverse('index'), 1, 10),
+            (self.client, reverse('group_posts', args=['budget-slug']), 3, 10),
+            (self.client, reverse('profile', args=['Author2']), 3, 5),
+            (self.reader_client, reverse('follow_index'), 3, 10),
+        )
+        for client, url, budget, posts_on_page in budgets:
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    response = client.get(url)
+                self.assertEqual(len(response.context['page']), posts_on_page)
+                self.assertContains(response, 'Комментариев: 1')
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_views_stay_within_declared_budgets(self):
+        """Авторизованные запросы укладываются в бюджеты @query_budget."""
+        post = Post.objects.filter(author__username='Author1').first()
+        urls = (
+            reverse('index'),
+            reverse('group_posts', args=['budget-slug']),
+            reverse('profile', args=['Author1']),
+            reverse('post', args=['Author1', post.pk]),
+            reverse('search') + '?q=Текст',
+            reverse('follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.reader_client.get(url)
+                self.assertIsNotNone(response.metrics.budget)
+                self.assertLessEqual(
+                    response.metrics.queries, response.metrics.budget)
+
+
+class FollowFeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='AndreyG')
+        cls.reader = User.objects.create_user(username='DaBaby')
+        cls.another_reader = User.objects.create_user(username='NaBaby')
+        cls.stranger = User.objects.create_user(username='Stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.another_client = Client()
+        self.another_client.force_login(self.another_reader)
+
+    def test_feed_fragment_is_not_shared_between_users(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Пост автора', author=self.author)
+        self.assertContains(
+            self.reader_client.get(reverse('follow_index')), 'Пост автора')
+        self.assertNotContains(
+            self.another_client.get(reverse('follow_index')), 'Пост автора')
+
+    def test_new_post_of_followed_author_invalidates_feed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(reverse('follow_index'))
+        Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertContains(
+            self.reader_client.get(reverse('follow_index')), 'Свежий пост')
+
+    def test_follow_and_unfollow_invalidate_feed(self):
+        Post.objects.create(text='Пост автора', author=self.author)
+        self.reader_client.get(reverse('follow_index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader_client.get(
+                reverse('profile_follow', kwargs={'username': 'AndreyG'}))
+        self.assertContains(
+            self.reader_client.get(reverse('follow_index')), 'Пост автора')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader_client.get(
+                reverse('profile_unfollow', kwargs={'username': 'AndreyG'}))
+        self.assertNotContains(
+            self.reader_client.get(reverse('follow_index')), 'Пост автора')
+
+    @override_settings(TASKS_EAGER=False)
+    def test_follow_changes_feed_version_after_commit(self):
+        before = feed_version(self.reader.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Follow.objects.create(user=self.reader, author=self.author)
+            self.assertEqual(feed_version(self.reader.pk), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(feed_version(self.reader.pk), before)
+
+    def test_unrelated_post_keeps_feed_cached(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост автора', author=self.author)
+        self.reader_client.get(reverse('follow_index'))
+        Post.objects.filter(pk=post.pk).update(text='Правка мимо сигналов')
+        Post.objects.create(text='Чужой пост', author=self.stranger)
+        self.assertContains(
+            self.reader_client.get(reverse('follow_index')), 'Пост автора')
+
+
+class ConditionalPageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='AndreyG')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Пост автора', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_not_modified_without_rendering(self):
+        urls = (
+            reverse('index'),
+            reverse('profile', args=['AndreyG']),
+            reverse('post', args=['AndreyG', self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Last-Modified', response)
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_anonymous_page_served_from_cache(self):
+        first = self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('index'))
+        self.assertEqual(cached.content, first.content)
+
+    def test_unrelated_params_share_cached_page(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('index'), {'junk': 1})
+        self.client.get(reverse('index'), {'page': 2, 'junk': 2})
+        with self.assertNumQueries(0):
+            self.client.get(reverse('index'), {'page': 2, 'junk': 3})
+
+    @override_settings(PAGE_RESPONSE_CACHE_TIMEOUT=0)
+    def test_cached_page_expires(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('index'))
+
+    def test_changes_produce_new_etag(self):
+        url = reverse('profile', args=['AndreyG'])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Подписчиков: 1')
+
+        url = reverse('post', args=['AndreyG', self.post.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='Ок')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ок')
+
+    def test_authenticated_etag_is_personal(self):
+        url = reverse('index')
+        anonymous = self.client.get(url)
+        response = self.reader_client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        response = self.reader_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=anonymous['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.reader)
+
+    def test_missing_objects_still_404(self):
+        self.assertEqual(
+            self.client.get(reverse('profile', args=['nobody'])).status_code,
+            404)
+        self.assertEqual(
+            self.client.get(reverse('group_posts', args=['nope'])).status_code,
+            404)
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='AndreyG')
+        cls.post = Post.objects.create(text='Вирусный пост', author=cls.author)
+        commenters = [
+            User.objects.create_user(username=f'Reader{i}') for i in range(3)
+        ]
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=commenters[i % 3],
+                    text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_comments(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse('post', args=['AndreyG', self.post.pk]))
+        page = response.context['comments']
+        self.assertEqual(len(page), COMMENTS_PER_PAGE)
+        self.assertEqual(page[0].text, 'Комментарий 0')
+        self.assertTrue(page.has_next())
+        self.assertContains(response, 'Показать еще комментарии')
+
+    def test_fragment_continues_after_cursor(self):
+        first = self.client.get(
+            reverse('post', args=['AndreyG', self.post.pk]))
+        cursor = first.context['comments'].paginator.next_cursor
+        url = reverse('post_comments', args=['AndreyG', self.post.pk])
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertTemplateUsed(response, 'posts/comment_items.html')
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, f'Комментарий {COMMENTS_PER_PAGE}')
+        self.assertNotContains(response, 'Показать еще комментарии')
+
+        data = self.client.get(
+            url, {'cursor': cursor, 'format': 'json'}).json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][0]['author'], 'Reader2')
+        self.assertIsNone(data['next_cursor'])
+
+    def test_fragment_of_missing_post(self):
+        response = self.client.get(
+            reverse('post_comments', args=['AndreyG', self.post.pk + 1]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+from tasks.queue import forget, task
+
+from .cache import invalidate_post_pages
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_KEY = 'posts:thumbnail:{}'
+VARIANTS_DIR = 'variants'
+MANIFEST = 'variants.json'
+# Пока миниатюра создается, хранилище не проверяется на каждом рендеринге.
+PENDING = ''
+PENDING_TIMEOUT = 60
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+EXTENSIONS = {'AVIF': 'avif', 'WEBP': 'webp', 'JPEG': 'jpg'}
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+
+def _key(name):
+    return THUMBNAIL_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def _directory(name):
+    return f'{VARIANTS_DIR}/{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def _read_manifest(name):
+    try:
+        with default_storage.open(f'{_directory(name)}/{MANIFEST}') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def find_thumbnail(name):
+    """
+    Готовые варианты картинки или ``None``. Список вариантов хранится
+    рядом с ними в ``variants.json``, а кэш — лишь его копия: после
+    очистки кэша или в другом процессе варианты находятся снова.
+    """
+    ready = cache.get(_key(name))
+    if ready is None:
+        ready = _read_manifest(name)
+        if ready is not None:
+            cache.set(_key(name), ready, None)
+    return ready
+
+
+def ready_thumbnail(name):
+    """
+    Готовые варианты картинки для шаблона или ``None``, если их нет.
+    Никогда не запускает Pillow во время рендеринга: пропавшие варианты
+    ставятся в очередь, а до их появления шаблон показывает оригинал.
+    """
+    if not name:
+        return None
+    ready = find_thumbnail(name)
+    if ready is None:
+        cache.set(_key(name), PENDING, PENDING_TIMEOUT)
+        schedule_thumbnail(name)
+    return ready or None
+
+
+def available_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет кодировать Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE and image_format in MIME_TYPES
+    ]
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=settings.POST_IMAGE_QUALITY.get(image_format, 80),
+    )
+    return buffer.getvalue()
+
+
+def _store(path, content):
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    saved = default_storage.save(path, ContentFile(content))
+    return default_storage.url(saved)
+
+
+@task(max_attempts=3)
+def generate_thumbnail(name):
+    """
+    Создать набор вариантов картинки поста: каждая ширина из
+    POST_IMAGE_WIDTHS в каждом доступном формате, с кадрированием по
+    центру до пропорций POST_IMAGE_ASPECT. Исходник декодируется один раз.
+    Список вариантов записывается последним файлом ``variants.json``.
+    """
+    with default_storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    widths = sorted(
+        width for width in settings.POST_IMAGE_WIDTHS if width <= image.width
+    ) or [min(settings.POST_IMAGE_WIDTHS)]
+    directory = _directory(name)
+
+    srcsets = {image_format: [] for image_format in available_formats()}
+    for width in widths:
+        height = round(width * aspect_height / aspect_width)
+        variant = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for image_format, srcset in srcsets.items():
+            url = _store(
+                f'{directory}/{width}.{EXTENSIONS[image_format]}',
+                _encode(variant, image_format),
+            )
+            srcset.append((width, url))
+
+    fallback_format = 'JPEG' if 'JPEG' in srcsets else next(iter(srcsets))
+    fallback = [
+        (width, url) for width, url in srcsets[fallback_format]
+        if width <= aspect_width
+    ] or srcsets[fallback_format][:1]
+    fallback_width, fallback_url = fallback[-1]
+    ready = {
+        'url': fallback_url,
+        'width': fallback_width,
+        'height': round(fallback_width * aspect_height / aspect_width),
+        'srcset': ', '.join(
+            f'{url} {width}w' for width, url in srcsets[fallback_format]),
+        'sizes': settings.POST_IMAGE_SIZES,
+        'sources': [
+            {
+                'type': MIME_TYPES[image_format],
+                'srcset': ', '.join(
+                    f'{url} {width}w' for width, url in srcset),
+            }
+            for image_format, srcset in srcsets.items()
+            if image_format != fallback_format
+        ],
+    }
+    _store(f'{directory}/{MANIFEST}', json.dumps(ready).encode())
+    cache.set(_key(name), ready, None)
+    posts = Post.objects.filter(image=name).values('author_id', 'group_id')
+    for post in posts:
+        invalidate_post_pages(post['author_id'], post['group_id'])
+    return ready
+
+
+def delete_thumbnail(name):
+    """Удалить все варианты картинки и запись о них в кэше."""
+    directory = _directory(name)
+    cache.delete(_key(name))
+    forget(f'thumbnail:{name}')
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        default_storage.delete(f'{directory}/{filename}')
+
+
+def collect_image(name):
+    """
+    Удалить файл картинки и ее варианты, если на нее не ссылается ни один
+    пост. Число ссылок считается по индексу на ``Post.image``. Файл
+    сначала убирается в сторону, и ссылки проверяются еще раз: пост с
+    той же картинкой мог быть зафиксирован между проверкой и удалением.
+    """
+    if Post.objects.filter(image=name).exists():
+        return False
+    storage = Post._meta.get_field('image').storage
+    try:
+        hidden = storage.withdraw(name)
+        if Post.objects.filter(image=name).exists():
+            storage.restore(hidden, name)
+            return False
+        storage.delete(hidden)
+    except FileNotFoundError:
+        return False
+    except (SuspiciousFileOperation, OSError):
+        logger.warning('Не удалось удалить картинку %s', name)
+        return False
+    delete_thumbnail(name)
+    return True
+
+
+def release_image(name):
+    """
+    Пост перестал ссылаться на картинку: после фиксации транзакции
+    проверить, остались ли у файла другие посты, и собрать его, если нет.
+    """
+    if name:
+        transaction.on_commit(lambda: collect_image(name))
+
+
+def schedule_thumbnail(name):
+    """
+    Поставить создание миниатюры в очередь после фиксации транзакции:
+    в синхронном режиме Pillow не должен работать внутри транзакции
+    запроса. Для уже встречавшейся картинки готовые варианты
+    переиспользуются, а одинаковые картинки ставятся в очередь один раз.
+    Завершенная задача, варианты которой пропали, ставится заново;
+    упавшая — нет, ее пересоздает ``warm_thumbnails --force``.
+    """
+    if not name or find_thumbnail(name):
+        return
+    key = f'thumbnail:{name}'
+
+    def enqueue():
+        forget(key, failed=False)
+        generate_thumbnail.enqueue(name, key=key)
+
+    transaction.on_commit(enqueue)
@@ -0,0 +1,194 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Follow, Post, TimelineEntry, UserCounter
+from .paginators import POSTS_PER_PAGE, CursorPaginator, get_page
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def is_fanned_out(author_id):
+    """
+    Посты авторов с огромным числом подписчиков не раскладываются по
+    лентам при записи — они подмешиваются при чтении.
+    """
+    return not UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def _entry(user_id, post):
+    return TimelineEntry(user_id=user_id, post_id=post.pk,
+                         author_id=post.author_id, pub_date=post.pub_date)
+
+
+def _trim(user_ids):
+    """Оставить в лентах пользователей не больше TIMELINE_MAX_LENGTH."""
+    limit = settings.TIMELINE_MAX_LENGTH
+    overflowing = TimelineEntry.objects.filter(
+        user_id__in=user_ids
+    ).values('user_id').annotate(total=Count('pk')).filter(total__gt=limit)
+    for row in overflowing:
+        entries = TimelineEntry.objects.filter(user_id=row['user_id'])
+        oldest_kept = entries.order_by('-pub_date', '-post_id')[limit - 1]
+        entries.filter(
+            Q(pub_date__lt=oldest_kept.pub_date)
+            | Q(pub_date=oldest_kept.pub_date,
+                post_id__lt=oldest_kept.post_id)
+        ).delete()
+
+
+def fan_out(post):
+    """Записать новый пост в ленты всех подписчиков автора."""
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """
+    Записать пачку новых постов в ленты подписчиков: подписчики каждого
+    автора читаются один раз на все его посты.
+    """
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    for author_id, author_posts in by_author.items():
+        if not is_fanned_out(author_id):
+            continue
+        # Старше TIMELINE_MAX_LENGTH новых постов все равно обрежутся.
+        author_posts = sorted(
+            author_posts, key=lambda post: (post.pub_date, post.pk),
+            reverse=True)[:settings.TIMELINE_MAX_LENGTH]
+        users_per_batch = max(1, FANOUT_BATCH_SIZE // len(author_posts))
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True).order_by('user_id')
+        batch = []
+        for user_id in followers.iterator(chunk_size=FANOUT_BATCH_SIZE):
+            batch.append(user_id)
+            if len(batch) == users_per_batch:
+                _write_batch(batch, author_posts)
+                batch = []
+        if batch:
+            _write_batch(batch, author_posts)
+
+
+def _write_batch(user_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        [_entry(user_id, post) for user_id in user_ids for post in posts],
+        ignore_conflicts=True,
+    )
+    _trim(user_ids)
+
+
+def backfill(user_id, author_id):
+    """После подписки добавить в ленту последние посты автора."""
+    if not is_fanned_out(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).only(
+        'pk', 'author_id', 'pub_date'
+    )[:settings.TIMELINE_MAX_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        [_entry(user_id, post) for post in posts],
+        ignore_conflicts=True,
+    )
+    _trim([user_id])
+
+
+def reached_fanout_limit(author_id):
+    """
+    После отписки у автора ровно ``TIMELINE_FANOUT_MAX_FOLLOWERS``
+    подписчиков: его посты только что перестали подмешиваться при чтении.
+    """
+    return UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def fan_out_author(author_id):
+    """
+    Разложить последние посты автора по лентам всех подписчиков. Посты,
+    написанные, пока автор был популярным, в ленты не попадали.
+    """
+    posts = Post.objects.filter(author_id=author_id).only(
+        'pk', 'author_id', 'pub_date'
+    )[:settings.TIMELINE_MAX_LENGTH]
+    fan_out_many(list(posts))
+
+
+def remove_author(user_id, author_id):
+    """После отписки убрать посты автора из ленты."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _read_time_authors(user):
+    return Follow.objects.filter(
+        user=user,
+        author__counters__followers_count__gt=(
+            settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        ),
+    ).values('author_id')
+
+
+def home_timeline(user):
+    """
+    Все посты ленты подписок: материализованная лента пользователя плюс
+    посты авторов, которые не раскладываются при записи. Страницы ленты
+    выбирает ``TimelinePaginator``.
+    """
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.for_feed().filter(
+        Q(pk__in=entries) | Q(author_id__in=_read_time_authors(user))
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Курсорные страницы ленты подписок. Общий ``ORDER BY`` по посту с
+    условием ``pk IN (...) OR author_id IN (...)`` не может идти по
+    индексу и сортирует всю ленту. Поэтому ключ страницы проверяется в
+    двух ограниченных подзапросах: ``per_page + 1`` записей ленты в
+    порядке индекса ``(user, -pub_date, -post)`` и столько же постов
+    авторов, подмешиваемых при чтении (их немного, и посты каждого ищутся
+    по ``(author, -pub_date, -id)``). Общий порядок восстанавливается на
+    этих строках, и страница по-прежнему — один запрос.
+    """
+    ENTRY_COLUMNS = {'id': 'post_id'}
+
+    def __init__(self, user, per_page):
+        self.user = user
+        super().__init__(Post.objects.for_feed(), per_page)
+
+    def _rows(self, ordering, values=None, after=True):
+        entries = TimelineEntry.objects.filter(user=self.user)
+        read_time = Post.objects.filter(
+            author_id__in=_read_time_authors(self.user))
+        if values is not None:
+            entries = entries.filter(
+                self._keyset(values, after, self.ENTRY_COLUMNS))
+            read_time = read_time.filter(self._keyset(values, after))
+        entry_ordering = [
+            name[:-len(field)] + self.ENTRY_COLUMNS.get(field, field)
+            for name, field in zip(ordering, self.fields)
+        ]
+        limit = self.per_page + 1
+        posts = self.object_list.filter(
+            Q(pk__in=entries.order_by(*entry_ordering)
+              .values('post_id')[:limit])
+            | Q(pk__in=read_time.order_by(*ordering).values('pk')[:limit])
+        )
+        return list(posts.order_by(*ordering)[:limit])
+
+
+def get_timeline_page(request, user, per_page=POSTS_PER_PAGE):
+    """
+    Страница ленты подписок для запроса: старые ссылки ``?page=N`` —
+    обычным ``Paginator``, остальные — ``TimelinePaginator``.
+    """
+    if request.GET.get('page') is not None:
+        return get_page(request, home_timeline(user), per_page)
+    return TimelinePaginator(user, per_page).get_page(
+        request.GET.get('cursor'))
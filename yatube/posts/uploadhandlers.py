@@ -0,0 +1,290 @@
+"""
+Потоковый прием картинок к постам.
+
+Стандартные обработчики Django сначала целиком сохраняют файл, а
+``ImageField`` затем открывает его Pillow. Здесь лимиты проверяются по
+мере чтения запроса: размер — по каждому пришедшему куску, формат и число
+пикселей — по заголовку, до декодирования. Метаданные JPEG и PNG
+вырезаются на лету, а файл пишется во временный файл в
+``FILE_UPLOAD_TEMP_DIR`` внутри ``MEDIA_ROOT``, который
+``FileSystemStorage`` при сохранении просто переносит на место.
+"""
+import hashlib
+import os
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, UnidentifiedImageError
+
+HEADER_LIMIT = 256 * 1024
+JPEG_METADATA_LIMIT = 1024 * 1024
+ORIENTATION_TAG = 0x0112
+
+
+class UploadRejected(Exception):
+    pass
+
+
+def _read_orientation(tiff):
+    """Значение тега Orientation из IFD0 блока EXIF или 1."""
+    order = {b'II': 'little', b'MM': 'big'}.get(tiff[:2])
+    if order is None or len(tiff) < 8:
+        return 1
+    offset = int.from_bytes(tiff[4:8], order)
+    if offset + 2 > len(tiff):
+        return 1
+    count = int.from_bytes(tiff[offset:offset + 2], order)
+    for index in range(count):
+        entry = tiff[offset + 2 + index * 12:offset + 14 + index * 12]
+        if len(entry) < 12:
+            break
+        if int.from_bytes(entry[:2], order) == ORIENTATION_TAG:
+            value = int.from_bytes(entry[8:10], order)
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+
+def _orientation_segment(orientation):
+    """Минимальный сегмент APP1, в котором остался только Orientation."""
+    tiff = (
+        b'MM\x00\x2a' + (8).to_bytes(4, 'big')
+        + (1).to_bytes(2, 'big')
+        + ORIENTATION_TAG.to_bytes(2, 'big') + (3).to_bytes(2, 'big')
+        + (1).to_bytes(4, 'big') + orientation.to_bytes(2, 'big')
+        + b'\x00\x00' + (0).to_bytes(4, 'big')
+    )
+    payload = b'Exif\x00\x00' + tiff
+    return b'\xff\xe1' + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+class JpegMetadataFilter:
+    """
+    Убирает из JPEG сегменты APP1 (EXIF, XMP) и APP13 (IPTC). Все они
+    стоят до начала сканирования, поэтому буферизуется только заголовок,
+    а сжатые данные дальше проходят без изменений. Поворот кадра
+    сохраняется отдельным крошечным блоком EXIF.
+    """
+    DROP = {0xE1, 0xED}
+    APP0 = 0xE0
+    START_OF_SCAN = 0xDA
+
+    def __init__(self):
+        self.buffer = b''
+        self.done = False
+
+    def feed(self, data):
+        if self.done:
+            return data
+        self.buffer += data
+        result = self._rewrite()
+        if result is None:
+            if len(self.buffer) > JPEG_METADATA_LIMIT:
+                raise UploadRejected('Слишком большой заголовок JPEG.')
+            return b''
+        self.done = True
+        self.buffer = b''
+        return result
+
+    def flush(self):
+        data, self.buffer = self.buffer, b''
+        return data
+
+    def _rewrite(self):
+        data = self.buffer
+        segments = [data[:2]]
+        orientation = 1
+        position = 2
+        while True:
+            if position + 4 > len(data):
+                return None
+            if data[position] != 0xFF:
+                raise UploadRejected('Файл JPEG поврежден.')
+            marker = data[position + 1]
+            if marker == 0xFF:
+                position += 1
+                continue
+            if marker == self.START_OF_SCAN:
+                break
+            end = position + 2 + int.from_bytes(
+                data[position + 2:position + 4], 'big')
+            if end > len(data):
+                return None
+            segment = data[position:end]
+            if marker == 0xE1 and segment[4:10] == b'Exif\x00\x00':
+                orientation = _read_orientation(segment[10:])
+            if marker not in self.DROP:
+                segments.append(segment)
+            position = end
+        if orientation != 1:
+            index = 2 if segments[1:2] and segments[1][1] == self.APP0 else 1
+            segments.insert(index, _orientation_segment(orientation))
+        return b''.join(segments) + data[position:]
+
+
+class PngMetadataFilter:
+    """
+    Пропускает PNG по чанкам, выбрасывая eXIf и текстовые чанки. В памяти
+    держится не больше заголовка одного чанка.
+    """
+    SIGNATURE_LENGTH = 8
+    DROP = {b'eXIf', b'tEXt', b'zTXt', b'iTXt'}
+
+    def __init__(self):
+        self.buffer = b''
+        self.signature_seen = False
+        self.remaining = 0
+        self.skipping = False
+
+    def feed(self, data):
+        self.buffer += data
+        output = []
+        while True:
+            if not self.signature_seen:
+                if len(self.buffer) < self.SIGNATURE_LENGTH:
+                    break
+                output.append(self.buffer[:self.SIGNATURE_LENGTH])
+                self.buffer = self.buffer[self.SIGNATURE_LENGTH:]
+                self.signature_seen = True
+                continue
+            if self.remaining:
+                chunk = self.buffer[:self.remaining]
+                self.buffer = self.buffer[len(chunk):]
+                self.remaining -= len(chunk)
+                if not self.skipping:
+                    output.append(chunk)
+                if self.remaining:
+                    break
+                continue
+            if len(self.buffer) < 8:
+                break
+            # Длина, тип, данные и CRC: 4 + 4 + length + 4 байта.
+            self.remaining = int.from_bytes(self.buffer[:4], 'big') + 12
+            self.skipping = self.buffer[4:8] in self.DROP
+        return b''.join(output)
+
+    def flush(self):
+        data, self.buffer = self.buffer, b''
+        return data
+
+
+class PassThroughFilter:
+    def feed(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+METADATA_FILTERS = {
+    'JPEG': JpegMetadataFilter,
+    'PNG': PngMetadataFilter,
+}
+
+
+class BoundedImageUploadHandler(FileUploadHandler):
+    """
+    Обработчик загрузки с лимитами ``POST_IMAGE_MAX_BYTES`` и
+    ``POST_IMAGE_MAX_PIXELS``. Отклоненный файл пропускается, а причина
+    записывается в ``request.upload_errors`` для показа в форме.
+    """
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if settings.FILE_UPLOAD_TEMP_DIR:
+            os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra)
+        self.received = 0
+        self.written = 0
+        self.digest = hashlib.sha256()
+        self.header = b''
+        self.filter = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        try:
+            if self.received > settings.POST_IMAGE_MAX_BYTES:
+                limit = settings.POST_IMAGE_MAX_BYTES // (1024 * 1024)
+                raise UploadRejected(
+                    f'Размер картинки не должен превышать {limit} МБ.')
+            if self.filter is None:
+                self.header += raw_data
+                self.filter = self._check_header()
+                if self.filter is None:
+                    return None
+                raw_data, self.header = self.header, b''
+            self._write(self.filter.feed(raw_data))
+        except UploadRejected as error:
+            self._reject(error)
+        return None
+
+    def file_complete(self, file_size):
+        try:
+            if self.filter is None:
+                self.filter = self._check_header(complete=True)
+                self._write(self.filter.feed(self.header))
+                self.header = b''
+            self._write(self.filter.flush())
+        except UploadRejected as error:
+            self.request.upload_errors[self.field_name] = str(error)
+            self.file.close()
+            return None
+        self.file.seek(0)
+        self.file.size = self.written
+        # Хеш для ContentAddressedStorage: файл не придется читать заново.
+        self.file.content_hash = self.digest.hexdigest()
+        return self.file
+
+    def _write(self, data):
+        if data:
+            self.file.write(data)
+            self.digest.update(data)
+            self.written += len(data)
+
+    def _reject(self, error):
+        self.request.upload_errors[self.field_name] = str(error)
+        raise SkipFile(str(error))
+
+    def _check_header(self, complete=False):
+        """
+        Открыть картинку по уже полученному началу файла. ``Image.open``
+        читает только заголовок и не выделяет память под пиксели.
+        """
+        try:
+            image = Image.open(BytesIO(self.header))
+        except Image.DecompressionBombError:
+            raise UploadRejected('Картинка слишком большая.')
+        except (UnidentifiedImageError, SyntaxError, OSError, ValueError):
+            if complete or len(self.header) > HEADER_LIMIT:
+                raise UploadRejected(
+                    'Загрузите правильное изображение. Файл, который вы '
+                    'загрузили, поврежден или не является изображением.')
+            return None
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise UploadRejected(
+                f'Картинка {width}×{height} слишком большая.')
+        if image.format not in settings.POST_IMAGE_UPLOAD_FORMATS:
+            formats = ', '.join(settings.POST_IMAGE_UPLOAD_FORMATS)
+            raise UploadRejected(
+                f'Поддерживаются только форматы {formats}.')
+        return METADATA_FILTERS.get(image.format, PassThroughFilter)()
+
+
+def bounded_image_uploads(view_func):
+    """
+    Подключить ``BoundedImageUploadHandler`` к view. Обработчики можно
+    менять только до чтения ``request.POST``, а ``CsrfViewMiddleware``
+    читает его раньше view, поэтому проверка CSRF переносится внутрь.
+    """
+    @csrf_exempt
+    @wraps(view_func)
+    def wrapped(request, *args, **kwargs):
+        request.upload_errors = {}
+        request.upload_handlers = [BoundedImageUploadHandler(request)]
+        return csrf_protect(view_func)(request, *args, **kwargs)
+    return wrapped
@@ -1,51 +1,71 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_GET, require_http_methods
+from yatube.metrics import query_budget
 
+from .cache import (author_scopes, conditional_page, feed_version,
+                    generation, group_scopes, index_scopes,
+                    page_cache_timeout)
+from .counters import get_counters
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Follow, Group, Post, User
+from .paginators import POSTS_PER_PAGE, get_comments_page, get_page
+from .search import SearchResults
+from .thumbnails import schedule_thumbnail
+from .timeline import get_timeline_page
+from .uploadhandlers import bounded_image_uploads
 
 
 @require_GET
+@query_budget(3)
+@conditional_page(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-
-    page_number = request.GET.get('page')
-
-    page = paginator.get_page(page_number)
+    page = get_page(request, Post.objects.for_feed())
     return render(
         request,
         'posts/index.html',
-        {'page': page}
+        {
+            'page': page,
+            'generation': generation('index', 'groups'),
+            'page_cache_timeout': page_cache_timeout(),
+        }
     )
 
 
 @require_GET
+@query_budget(5)
+@conditional_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group)
-    paginator = Paginator(posts, 10)
-
-    page_number = request.GET.get('page')
-
-    page = paginator.get_page(page_number)
-    return render(request, "posts/group.html", {"group": group, "page": page})
+    page = get_page(request, Post.objects.for_feed().filter(group=group))
+    return render(request, "posts/group.html", {
+        "group": group,
+        "page": page,
+        "generation": generation(f'group:{group.pk}', 'groups'),
+        "page_cache_timeout": page_cache_timeout(),
+    })
 
 
 @require_GET
+@query_budget(6)
+@conditional_page(author_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
-    number_of_posts = posts.count()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
+    counters = get_counters(author)
+    page = get_page(request, Post.objects.for_feed().filter(author=author))
     context = {
         "author": author,
-        "number_of_posts": number_of_posts,
+        "counters": counters,
+        "number_of_posts": counters.posts_count,
         "page": page,
+        "generation": generation(f'author:{author.pk}', 'groups'),
+        "page_cache_timeout": page_cache_timeout(),
     }
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user,
@@ -56,47 +76,102 @@ def profile(request, username):
 
 
 @require_GET
+@query_budget(6)
+@conditional_page(author_scopes)
 def post_view(request, username, post_id):
-    author = get_object_or_404(User, username=username)
-    number_of_posts = Post.objects.filter(author=author).count()
-    post = get_object_or_404(Post, author=author, id=post_id)
-    comments = Comment.objects.filter(post=post)
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
+    counters = get_counters(author)
+    post = get_object_or_404(Post.objects.for_feed(), author=author,
+                             id=post_id)
     form = CommentForm()
     return render(
         request,
         'posts/post.html',
         {
             "author": author,
-            "number_of_posts": number_of_posts,
+            "counters": counters,
+            "number_of_posts": counters.posts_count,
             "post": post,
             "form": form,
-            "comments": comments
+            "comments": get_comments_page(request, post),
         }
     )
 
 
+@require_GET
+@query_budget(3)
+@conditional_page(author_scopes, ('cursor', 'format'))
+def post_comments(request, username, post_id):
+    """
+    Следующие страницы комментариев для подгрузки без перезагрузки:
+    HTML-фрагмент или JSON при ``?format=json``.
+    """
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             author__username=username, id=post_id)
+    page = get_comments_page(request, post)
+    if request.GET.get('format') != 'json':
+        return render(request, 'posts/comment_items.html', {
+            'post': post,
+            'comments': page,
+        })
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in page
+        ],
+        'next_cursor': page.paginator.next_cursor,
+    })
+
+
+@require_GET
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        paginator = Paginator(SearchResults(query), POSTS_PER_PAGE)
+        page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page': page,
+        'extra_query': urlencode({'q': query}) + '&',
+    })
+
+
 @require_http_methods(["GET", "POST"])
 @login_required
+@bounded_image_uploads
 def new_post(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    upload_errors=request.upload_errors)
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
         form.save()
+        schedule_thumbnail(new_post.image.name)
         return redirect('index')
     return render(request, 'posts/post_new_or_edit.html', {'form': form})
 
 
 @require_http_methods(["GET", "POST"])
 @login_required
+@bounded_image_uploads
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, pk=post_id)
     if request.user != post.author:
         return redirect('post', username=username, post_id=post_id)
     form = PostForm(request.POST or None, files=request.FILES or None,
-                    instance=post)
+                    instance=post, upload_errors=request.upload_errors)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnail(post.image.name)
         return redirect('post', username=username, post_id=post_id)
     return render(
         request,
@@ -139,14 +214,14 @@ def server_error(request):
 
 @require_GET
 @login_required
+@query_budget(3)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-
-    page_number = request.GET.get('page')
-
-    page = paginator.get_page(page_number)
-    return render(request, "posts/follow.html", {'page': page})
+    page = get_timeline_page(request, request.user)
+    return render(request, "posts/follow.html", {
+        'page': page,
+        'feed_version': feed_version(request.user.pk),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    })
 
 
 @require_http_methods(["GET", "POST"])
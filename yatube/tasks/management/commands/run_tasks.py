@@ -0,0 +1,88 @@
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tasks.queue import purge, work
+
+_stop = None
+
+
+def _init_worker(stop):
+    """Инициализация процесса пула: Django и общее событие остановки."""
+    global _stop
+    _stop = stop
+    # Останавливает родитель через событие: SIGINT из терминала и SIGTERM
+    # от systemd или docker получает вся группа процессов, и без этого
+    # дочерний процесс умер бы посреди забранной задачи.
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, signal.SIG_IGN)
+    django.setup()
+
+
+def _work(poll_interval, once):
+    return work(_stop, poll_interval, once)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи из очереди в пуле процессов. SIGINT или SIGTERM '
+        'дожидается текущих задач и завершает воркеры.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int,
+            default=settings.TASKS_WORKER_PROCESSES,
+            help='Число процессов; 1 — выполнять в текущем процессе.')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда готовых задач не останется.')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1:
+            raise CommandError('--processes должен быть больше нуля.')
+        purged = purge()
+        handlers = {
+            signum: signal.getsignal(signum)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            if options['processes'] == 1:
+                stop = threading.Event()
+                self._on_signals(stop)
+                done = work(stop, options['poll_interval'], options['once'])
+            else:
+                done = self._run_pool(options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {done}, удалено старых: {purged}'))
+
+    def _run_pool(self, options):
+        context = multiprocessing.get_context()
+        stop = context.Event()
+        # Соединения родителя не должны достаться дочерним процессам.
+        connections.close_all()
+        with ProcessPoolExecutor(
+                max_workers=options['processes'], mp_context=context,
+                initializer=_init_worker, initargs=(stop,)) as pool:
+            futures = [
+                pool.submit(_work, options['poll_interval'], options['once'])
+                for _ in range(options['processes'])
+            ]
+            self._on_signals(stop)
+            return sum(future.result() for future in futures)
+
+    def _on_signals(self, stop):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
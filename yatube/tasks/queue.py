@@ -0,0 +1,192 @@
+"""
+Очередь задач в таблице базы данных, без внешнего брокера.
+
+Функция, отмеченная ``@task``, ставится в очередь вызовом
+``func.enqueue(*args, key=...)``: в текущей транзакции добавляется строка
+``Task``, так что задача появляется у воркеров только вместе с записью,
+которая ее породила. Аргументы хранятся в JSON.
+
+Воркер (``manage.py run_tasks``) забирает задачу условным ``UPDATE``,
+который проходит только у одного процесса. Упавшая задача повторяется с
+экспоненциальной задержкой до ``max_attempts`` раз, а задача, воркер
+которой умер, снова становится доступна после ``TASKS_LOCK_TIMEOUT``.
+Выполнение гарантируется хотя бы один раз, поэтому задачи должны быть
+идемпотентны. Общей транзакции у задачи нет: на SQLite транзакция,
+которая сначала читает, а потом пишет, получает «database is locked» без
+ожидания, если другой воркер успел записать раньше.
+
+Ключ идемпотентности ``key`` уникален: повторная постановка с тем же
+ключом ничего не делает, пока старая задача хранится
+(``TASKS_RETENTION`` секунд после завершения).
+
+При ``TASKS_EAGER`` задачи выполняются сразу при постановке, в том же
+процессе и транзакции — так работают тесты и разработка без воркера.
+Упавшая задача, как и у воркера, только пишется в лог: запись, которая
+ее поставила, уже могла быть зафиксирована (``on_commit``), и ответ не
+должен из-за этого становиться ошибкой.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH = 10
+
+registry = {}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Зарегистрировать функцию как задачу и добавить ей ``enqueue``."""
+    def decorator(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        func.enqueue = lambda *args, **options: enqueue(
+            func, *args, **options)
+        registry[func.task_name] = func
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue(func, *args, key=None, delay=0):
+    """
+    Поставить вызов ``func(*args)`` в очередь через ``delay`` секунд.
+    Возвращает строку ``Task``; в синхронном режиме — ``None``.
+    """
+    if settings.TASKS_EAGER:
+        _run_eager(func, args)
+        return None
+    fields = {
+        'name': func.task_name,
+        'args': list(args),
+        'max_attempts': func.max_attempts or settings.TASKS_MAX_ATTEMPTS,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if key is None:
+        return Task.objects.create(**fields)
+    queued, _ = Task.objects.get_or_create(key=key, defaults=fields)
+    return queued
+
+
+def _run_eager(func, args):
+    """
+    Выполнить задачу на месте. Внутри транзакции вызывающего задача идет в
+    точке сохранения, чтобы ее ошибка в базе не сломала эту транзакцию.
+    """
+    try:
+        if connection.in_atomic_block:
+            with transaction.atomic():
+                func(*args)
+        else:
+            func(*args)
+    except Exception:
+        logger.exception('Задача %s упала', func.task_name)
+
+
+def forget(key, failed=True):
+    """
+    Разрешить снова поставить задачу с ключом ``key``, если прежняя уже
+    завершилась, например после удаления ее результата. При
+    ``failed=False`` упавшая задача остается и блокирует ключ: повторять
+    ее с теми же аргументами бессмысленно.
+    """
+    statuses = [Task.DONE, Task.FAILED] if failed else [Task.DONE]
+    Task.objects.filter(key=key, status__in=statuses).delete()
+
+
+def retry_delay(attempts):
+    """Задержка перед повтором: удваивается с каждой попыткой, с шумом."""
+    delay = min(settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+                settings.TASKS_RETRY_MAX_DELAY)
+    return delay * random.uniform(1, 1.5)
+
+
+def _available(now):
+    return (Q(status=Task.QUEUED, run_at__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now))
+
+
+def claim():
+    """
+    Забрать одну готовую задачу. Кандидаты читаются без блокировок, а
+    владение переходит условным ``UPDATE``: если другой воркер успел
+    раньше, строка не обновится и берется следующий кандидат.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(_available(now)).order_by(
+        'run_at', 'pk').values_list('pk', flat=True)[:CLAIM_BATCH]
+    locked_until = now + timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    for pk in candidates:
+        claimed = Task.objects.filter(_available(now), pk=pk).update(
+            status=Task.RUNNING, locked_until=locked_until,
+            attempts=F('attempts') + 1)
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(queued):
+    """Выполнить забранную задачу и записать результат."""
+    func = registry.get(queued.name)
+    try:
+        if func is None:
+            raise LookupError(f'Задача {queued.name} не зарегистрирована')
+        func(*queued.args)
+    except Exception:
+        logger.exception('Задача %s упала', queued)
+        now = timezone.now()
+        queued.last_error = traceback.format_exc()
+        if func is None or queued.attempts >= queued.max_attempts:
+            queued.status = Task.FAILED
+            queued.finished = now
+        else:
+            queued.status = Task.QUEUED
+            queued.run_at = now + timedelta(
+                seconds=retry_delay(queued.attempts))
+    else:
+        queued.status = Task.DONE
+        queued.finished = timezone.now()
+        queued.last_error = ''
+    queued.locked_until = None
+    queued.save(update_fields=[
+        'status', 'run_at', 'locked_until', 'last_error', 'finished'])
+    return queued.status
+
+
+def purge():
+    """Удалить завершенные задачи старше ``TASKS_RETENTION``."""
+    before = timezone.now() - timedelta(seconds=settings.TASKS_RETENTION)
+    deleted, _ = Task.objects.filter(
+        status__in=[Task.DONE, Task.FAILED], finished__lt=before).delete()
+    return deleted
+
+
+def work(stop, poll_interval=1.0, once=False):
+    """
+    Цикл воркера: выполнять задачи, пока не выставлено событие ``stop``.
+    При ``once`` выйти, когда готовых задач не осталось. Возвращает число
+    выполненных задач.
+    """
+    done = 0
+    while not stop.is_set():
+        close_old_connections()
+        queued = claim()
+        if queued is None:
+            if once:
+                break
+            stop.wait(poll_interval)
+            continue
+        execute(queued)
+        done += 1
+    close_old_connections()
+    return done
@@ -0,0 +1,19 @@
+"""
+Тесты выполняют задачи сразу при постановке (``TASKS_EAGER``), как
+разработка без воркера: проверки видят побочные эффекты записи без
+запуска ``run_tasks``. Очередь проверяется с
+``override_settings(TASKS_EAGER=False)``.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+def enable_eager_tasks():
+    settings.TASKS_EAGER = True
+
+
+class EagerTasksRunner(DiscoverRunner):
+    """Основа раннера ``manage.py test`` (``yatube.testing.TestRunner``)."""
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        enable_eager_tasks()
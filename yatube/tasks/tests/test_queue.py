@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.models import Follow, Post
+from posts.search import SearchResults
+from posts.timeline import home_timeline
+
+from ..models import Task
+from ..queue import claim, execute, purge, task
+
+User = get_user_model()
+
+calls = []
+
+
+@task(max_attempts=2)
+def record(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise ValueError(value)
+
+
+@task
+def create_user(username):
+    User.objects.create_user(username=username)
+
+
+@override_settings(TASKS_EAGER=False)
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_key_enqueues_once(self):
+        first = record.enqueue('a', key='record:a')
+        second = record.enqueue('b', key='record:a')
+        self.assertEqual(first, second)
+        self.assertEqual(Task.objects.get().args, ['a'])
+        self.assertEqual(calls, [])
+
+    def test_claim_takes_task_once(self):
+        record.enqueue('a')
+        queued = claim()
+        self.assertEqual((queued.status, queued.attempts),
+                         (Task.RUNNING, 1))
+        self.assertIsNone(claim())
+        self.assertEqual(execute(queued), Task.DONE)
+        self.assertEqual(calls, ['a'])
+
+    def test_delayed_task_waits(self):
+        record.enqueue('a', delay=60)
+        self.assertIsNone(claim())
+
+    def test_failed_task_retries_with_backoff(self):
+        record.enqueue('a', True)
+        started = timezone.now()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertEqual(execute(claim()), Task.QUEUED)
+        queued = Task.objects.get()
+        self.assertIn('ValueError', queued.last_error)
+        self.assertGreaterEqual(queued.run_at, started + timedelta(
+            seconds=10))
+        self.assertIsNone(claim())
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertEqual(execute(claim()), Task.FAILED)
+        self.assertEqual(calls, ['a', 'a'])
+        self.assertIsNone(claim())
+
+    def test_abandoned_task_is_reclaimed(self):
+        record.enqueue('a')
+        claim()
+        self.assertIsNone(claim())
+        Task.objects.update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim().attempts, 2)
+
+    def test_unknown_task_fails(self):
+        Task.objects.create(name='tasks.missing', max_attempts=5)
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertEqual(execute(claim()), Task.FAILED)
+
+    def test_purge_keeps_recent_tasks(self):
+        record.enqueue('old')
+        record.enqueue('new')
+        Task.objects.update(status=Task.DONE, finished=timezone.now())
+        Task.objects.filter(args=['old']).update(
+            finished=timezone.now() - timedelta(days=8))
+        self.assertEqual(purge(), 1)
+        self.assertEqual(Task.objects.get().args, ['new'])
+
+    def test_worker_applies_post_side_effects(self):
+        author = User.objects.create_user(username='AndreyG')
+        reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(text='Отложенная индексация',
+                                   author=author)
+        self.assertFalse(home_timeline(reader).exists())
+        self.assertEqual(SearchResults('отложенная').count(), 0)
+
+        out = StringIO()
+        call_command('run_tasks', once=True, processes=1, stdout=out)
+        self.assertIn('Выполнено задач', out.getvalue())
+        self.assertEqual(list(home_timeline(reader)), [post])
+        self.assertEqual(SearchResults('отложенная').count(), 1)
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+
+class EagerQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_eager_runs_inline_and_logs_errors(self):
+        self.assertIsNone(record.enqueue('a'))
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertIsNone(record.enqueue('b', True))
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_eager_failure_on_commit_is_logged(self):
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                transaction.on_commit(lambda: record.enqueue('c', True))
+        self.assertEqual(calls, ['c'])
+
+    def test_eager_database_error_keeps_transaction(self):
+        create_user.enqueue('AndreyG')
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            create_user.enqueue('AndreyG')
+        self.assertEqual(User.objects.count(), 1)
@@ -0,0 +1,30 @@
+"""
+Бэкенд аутентификации, который берет пользователя запроса из кэша.
+
+``AuthenticationMiddleware`` на каждом запросе загружает пользователя по
+id из сессии. Вместе с ``cached_db``-сессиями это убирает оба запроса к
+базе до вызова view. Запись кэша сбрасывается при любом сохранении
+пользователя, поэтому после смены пароля хеш в сессии перестает
+совпадать и старые сессии разлогиниваются, как и без кэша.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = 'users:user:{}'
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
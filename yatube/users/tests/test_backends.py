@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..backends import CachedModelBackend
+
+User = get_user_model()
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    AUTHENTICATION_BACKENDS=['users.backends.CachedModelBackend'],
+)
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='Reader', password='old-password-123')
+        self.client.login(username='Reader', password='old-password-123')
+
+    def test_index_skips_session_and_user_queries(self):
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['user'], self.user)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('FROM "django_session"', sql)
+        self.assertNotIn('FROM "auth_user" WHERE', sql)
+
+    def test_password_change_logs_out(self):
+        follow_index = reverse('follow_index')
+        self.assertEqual(self.client.get(follow_index).status_code, 200)
+        self.user.set_password('new-password-456')
+        self.user.save()
+        response = self.client.get(follow_index)
+        self.assertRedirects(
+            response, f"{reverse('login')}?next={follow_index}")
+
+    def test_saved_user_is_reloaded(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(first_name='Старое')
+        self.assertEqual(backend.get_user(self.user.pk).first_name, '')
+        self.user.first_name = 'Новое'
+        self.user.save()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Новое')
+
+    def test_inactive_user_is_not_returned(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(CachedModelBackend().get_user(self.user.pk))
+
+
+class LocalCacheAuthenticationTest(TestCase):
+    """Без общего кэша сессии и пользователи читаются из базы."""
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='Reader', password='old-password-123')
+
+    def test_local_cache_falls_back_to_database(self):
+        self.assertEqual(
+            settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+        self.assertEqual(
+            settings.AUTHENTICATION_BACKENDS,
+            ['django.contrib.auth.backends.ModelBackend'])
+
+    def test_password_change_ends_other_sessions(self):
+        follow_index = reverse('follow_index')
+        other = Client()
+        for client in (self.client, other):
+            client.login(username='Reader', password='old-password-123')
+            self.assertEqual(client.get(follow_index).status_code, 200)
+
+        response = other.post(reverse('password_change'), {
+            'old_password': 'old-password-123',
+            'new_password1': 'new-password-456',
+            'new_password2': 'new-password-456',
+        })
+        self.assertRedirects(response, reverse('password_change_done'))
+
+        self.assertEqual(other.get(follow_index).status_code, 200)
+        response = self.client.get(follow_index)
+        self.assertRedirects(
+            response, f"{reverse('login')}?next={follow_index}")
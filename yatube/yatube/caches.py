@@ -0,0 +1,284 @@
+"""
+Настройка кэша из переменных окружения и бэкенд для серверов,
+говорящих по протоколу Redis (RESP).
+
+Django 3.2 не содержит Redis-бэкенда, поэтому здесь реализован небольшой
+клиент: пул соединений на процесс (``yatube.pools``), конвейерная
+отправка команд и хранение целых чисел в открытом виде, чтобы ``incr``
+выполнялся на сервере.
+"""
+import pickle
+import socket
+from urllib.parse import parse_qs, unquote, urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+from .pools import ConnectionPool
+
+DEFAULT_MAX_CONNECTIONS = 50
+
+LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_from_url(url, key_prefix='', version=1, timeout=300):
+    """
+    Словарь для ``settings.CACHES`` по адресу вида ``locmem://``,
+    ``dummy://``, ``redis://[:password@]host:port/db`` или
+    ``memcached://host:port,host:port``. Размер пула соединений задается
+    параметром ``?max_connections=``.
+    """
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    max_connections = int(
+        query.get('max_connections', [DEFAULT_MAX_CONNECTIONS])[0])
+    config = {
+        'KEY_PREFIX': key_prefix,
+        'VERSION': version,
+        'TIMEOUT': timeout,
+    }
+    if parsed.scheme == 'locmem':
+        config['BACKEND'] = 'django.core.cache.backends.locmem.LocMemCache'
+        config['LOCATION'] = parsed.netloc
+    elif parsed.scheme == 'dummy':
+        config['BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+    elif parsed.scheme == 'redis':
+        config['BACKEND'] = 'yatube.caches.RedisCache'
+        config['LOCATION'] = url.split('?', 1)[0]
+        config['OPTIONS'] = {'MAX_CONNECTIONS': max_connections}
+    elif parsed.scheme == 'memcached':
+        config['BACKEND'] = (
+            'django.core.cache.backends.memcached.PyMemcacheCache')
+        config['LOCATION'] = parsed.netloc.split(',')
+        config['OPTIONS'] = {
+            'use_pooling': True,
+            'max_pool_size': max_connections,
+        }
+    else:
+        raise ImproperlyConfigured(f'Неизвестная схема кэша: {url}')
+    return config
+
+
+def is_shared_cache(config):
+    """
+    Видят ли все процессы одни и те же записи кэша ``config``. Кэш в
+    памяти процесса у каждого воркера свой, и данные, которые должны
+    сбрасываться сразу везде, в нем хранить нельзя.
+    """
+    return config['BACKEND'] not in LOCAL_BACKENDS
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    @classmethod
+    def open(cls, location, timeout):
+        """Соединение по адресу ``redis://[:password@]host:port/db``."""
+        parsed = urlparse(location)
+        connection = cls(parsed.hostname or 'localhost', parsed.port or 6379,
+                         timeout)
+        setup = []
+        if parsed.password:
+            setup.append(('AUTH', unquote(parsed.password)))
+        db = int(parsed.path.lstrip('/') or 0)
+        if db:
+            setup.append(('SELECT', db))
+        if setup:
+            connection.execute(*setup)
+        return connection
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    @staticmethod
+    def _encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Сервер кэша закрыл соединение')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload
+        if kind == b'-':
+            return RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f'Неизвестный ответ сервера: {line!r}')
+
+    def execute(self, *commands):
+        """
+        Отправить команды одним пакетом и прочитать ответы по порядку.
+        Ошибка сервера поднимается только после чтения всех ответов, чтобы
+        соединение можно было вернуть в пул.
+        """
+        self.sock.sendall(b''.join(self._encode(args) for args in commands))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+
+class RedisCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS') or {}
+        timeout = options.get('SOCKET_TIMEOUT', 5)
+        self._pool = ConnectionPool.for_key(
+            ('redis', server),
+            int(options.get('MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)),
+            timeout,
+        )
+        self._location = server
+        self._timeout = timeout
+
+    def _connect(self):
+        return RedisConnection.open(self._location, self._timeout)
+
+    def _execute(self, *commands):
+        with self._pool.connection(
+                self._connect, reusable_errors=RedisError) as connection:
+            return connection.execute(*commands)
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        """Срок жизни в миллисекундах для ``PX``; ``None`` — бессрочно."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(int(timeout * 1000), 0)
+
+    @staticmethod
+    def _dumps(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(data):
+        if data is None:
+            return None
+        if data.startswith(b'\x80'):
+            return pickle.loads(data)
+        return int(data)
+
+    def _set_command(self, key, value, timeout, *flags):
+        command = ['SET', key, self._dumps(value)]
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            command += ['PX', timeout]
+        return tuple(command) + flags
+
+    def _prepare_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare_key(key, version)
+        if self.get_backend_timeout(timeout) == 0:
+            return False
+        reply, = self._execute(self._set_command(key, value, timeout, 'NX'))
+        return reply is not None
+
+    def get(self, key, default=None, version=None):
+        key = self._prepare_key(key, version)
+        data, = self._execute(('GET', key))
+        return default if data is None else self._loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare_key(key, version)
+        if self.get_backend_timeout(timeout) == 0:
+            self._execute(('DEL', key))
+            return
+        self._execute(self._set_command(key, value, timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare_key(key, version)
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            reply, = self._execute(('PERSIST', key))
+            return bool(reply) or self.has_key(key, version=version)
+        reply, = self._execute(('PEXPIRE', key, timeout))
+        return bool(reply)
+
+    def delete(self, key, version=None):
+        key = self._prepare_key(key, version)
+        reply, = self._execute(('DEL', key))
+        return bool(reply)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = [self._prepare_key(key, version) for key in keys]
+        values, = self._execute(('MGET', *made))
+        return {
+            key: self._loads(data)
+            for key, data in zip(keys, values) if data is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        if self.get_backend_timeout(timeout) == 0:
+            self.delete_many(data, version=version)
+            return []
+        self._execute(*[
+            self._set_command(self._prepare_key(key, version), value, timeout)
+            for key, value in data.items()
+        ])
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._prepare_key(key, version) for key in keys]
+        if keys:
+            self._execute(('DEL', *keys))
+
+    def has_key(self, key, version=None):
+        key = self._prepare_key(key, version)
+        reply, = self._execute(('EXISTS', key))
+        return bool(reply)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._prepare_key(key, version)
+        exists, = self._execute(('EXISTS', key))
+        if not exists:
+            raise ValueError("Key '%s' not found" % key)
+        try:
+            value, = self._execute(('INCRBY', key, delta))
+        except RedisError:
+            raise ValueError("Key '%s' is not an integer" % key)
+        return value
+
+    def clear(self):
+        self._execute(('FLUSHDB',))
@@ -0,0 +1,94 @@
+"""
+PostgreSQL с проверкой постоянных соединений и необязательным пулом.
+
+Django 3.2 держит соединение открытым ``CONN_MAX_AGE`` секунд, но не
+замечает, что сервер его разорвал: первый запрос после перезапуска базы
+падает. При ``CONN_HEALTH_CHECKS`` соединение проверяется перед первым
+обращением к базе в каждом HTTP-запросе и при необходимости открывается
+заново.
+
+С ``OPTIONS['pool']`` закрытие соединения возвращает его в пул процесса,
+а новое берется оттуда же; так ``CONN_MAX_AGE=0`` не стоит нового
+подключения к серверу на каждый запрос. Незавершенная транзакция перед
+возвратом откатывается.
+"""
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from yatube.databases import DEFAULT_POOL_TIMEOUT
+from yatube.pools import ConnectionPool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Соединения из пула иначе не дадут удалить тестовую базу.
+        ConnectionPool.disconnect_all()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    health_check_done = False
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        settings_dict = self.settings_dict
+        key = (self.alias, settings_dict['NAME'], settings_dict['HOST'],
+               settings_dict['PORT'], settings_dict['USER'])
+        return ConnectionPool.for_key(
+            key, options['max_size'],
+            options.get('timeout', DEFAULT_POOL_TIMEOUT))
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params))
+        self.isolation_level = connection.isolation_level
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        reusable = (
+            not connection.closed
+            and connection.get_transaction_status()
+            != extensions.TRANSACTION_STATUS_UNKNOWN
+        )
+        if reusable and connection.get_transaction_status() != (
+                extensions.TRANSACTION_STATUS_IDLE):
+            try:
+                connection.rollback()
+            except base.Database.Error:
+                reusable = False
+        pool.release(connection, reusable)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and self.connection is not None
+                and not self.health_check_done
+                and not self.in_atomic_block):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
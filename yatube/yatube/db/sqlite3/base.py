@@ -0,0 +1,31 @@
+"""
+SQLite с прагмами для параллельной работы нескольких воркеров: журнал
+WAL позволяет читать во время записи, ``synchronous=NORMAL`` в режиме WAL
+не теряет целостность при сбое, а ``busy_timeout`` заставляет писателя
+подождать блокировку вместо мгновенной ошибки «database is locked».
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = {**PRAGMAS, **self.settings_dict['OPTIONS'].get(
+            'pragmas', {})}
+        for name, value in pragmas.items():
+            value = str(value)
+            if not name.isidentifier() or not value.lstrip('-').isalnum():
+                raise ValueError(f'Недопустимая прагма: {name}={value}')
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
@@ -0,0 +1,275 @@
+"""
+Метрики запросов: число SQL-запросов и время в БД, время рендеринга
+шаблонов, попадания и промахи кэша и общее время ответа.
+
+``RequestMetricsMiddleware`` собирает их для каждого запроса, отдает в
+заголовке ``Server-Timing`` и накапливает в ``registry``, который
+view ``metrics`` выводит в текстовом формате Prometheus. Счетчики живут
+в памяти процесса, поэтому каждый воркер опрашивается отдельно.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.view = None
+        self.budget = None
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hit, {self.cache_misses} miss"',
+            f'total;dur={self.duration * 1000:.1f}',
+        ])
+
+
+def query_budget(queries):
+    """
+    Задать для view предельное число SQL-запросов на весь запрос, включая
+    загрузку сессии и пользователя. Превышение пишется в лог и в метрики,
+    а при ``QUERY_BUDGET_STRICT = True`` поднимает ``QueryBudgetExceeded``.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(*args, **kwargs):
+            return view_func(*args, **kwargs)
+        wrapped.query_budget = queries
+        return wrapped
+    return decorator
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+_MISSING = object()
+
+
+def _instrument_cache(cache):
+    """
+    Обернуть ``get`` и ``get_many`` экземпляра кэша, чтобы считать
+    попадания и промахи. Экземпляры кэша у Django свои в каждом потоке,
+    поэтому обертка ставится один раз на поток.
+    """
+    if getattr(cache, '_metrics_instrumented', False):
+        return
+    get, get_many = cache.get, cache.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def counted_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+    cache.get = counted_get
+    cache.get_many = counted_get_many
+    cache._metrics_instrumented = True
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который учитывает время рендеринга."""
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class MetricsRegistry:
+    """Накопленные с запуска процесса метрики по именам view."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.durations = {}
+            self.totals = {}
+            self.budget_exceeded = {}
+
+    def observe(self, metrics, method, status):
+        view = metrics.view or 'unresolved'
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            buckets, total, count = self.durations.get(
+                view, ([0] * len(DURATION_BUCKETS), 0.0, 0))
+            buckets = [
+                hits + (metrics.duration <= bound)
+                for hits, bound in zip(buckets, DURATION_BUCKETS)
+            ]
+            self.durations[view] = (
+                buckets, total + metrics.duration, count + 1)
+            totals = self.totals.setdefault(view, {
+                'db_queries_total': 0,
+                'db_duration_seconds_total': 0.0,
+                'template_duration_seconds_total': 0.0,
+                'cache_hits_total': 0,
+                'cache_misses_total': 0,
+            })
+            totals['db_queries_total'] += metrics.queries
+            totals['db_duration_seconds_total'] += metrics.db_time
+            totals['template_duration_seconds_total'] += (
+                metrics.template_time)
+            totals['cache_hits_total'] += metrics.cache_hits
+            totals['cache_misses_total'] += metrics.cache_misses
+            if metrics.over_budget:
+                self.budget_exceeded[view] = (
+                    self.budget_exceeded.get(view, 0) + 1)
+
+    def render(self):
+        """Текст в формате Prometheus exposition 0.0.4."""
+        lines = [
+            '# TYPE yatube_requests_total counter',
+        ]
+        with self._lock:
+            for (view, method, status), value in sorted(
+                    self.requests.items()):
+                lines.append(
+                    f'yatube_requests_total{{view="{view}",'
+                    f'method="{method}",status="{status}"}} {value}')
+            lines.append('# TYPE yatube_request_duration_seconds histogram')
+            for view, (buckets, total, count) in sorted(
+                    self.durations.items()):
+                name = 'yatube_request_duration_seconds'
+                for bound, hits in zip(DURATION_BUCKETS, buckets):
+                    lines.append(
+                        f'{name}_bucket{{view="{view}",le="{bound}"}} {hits}')
+                lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                             f'{count}')
+                lines.append(f'{name}_sum{{view="{view}"}} {total}')
+                lines.append(f'{name}_count{{view="{view}"}} {count}')
+            names = sorted({
+                name for totals in self.totals.values() for name in totals
+            })
+            for name in names:
+                lines.append(f'# TYPE yatube_{name} counter')
+                for view, totals in sorted(self.totals.items()):
+                    lines.append(
+                        f'yatube_{name}{{view="{view}"}} {totals[name]}')
+            lines.append('# TYPE yatube_query_budget_exceeded_total counter')
+            for view, value in sorted(self.budget_exceeded.items()):
+                lines.append(
+                    f'yatube_query_budget_exceeded_total{{view="{view}"}} '
+                    f'{value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Должна стоять первой в ``MIDDLEWARE``, чтобы учитывать и запросы
+    остальных middleware (сессия, пользователь). Метрики запроса доступны
+    в ``response.metrics``.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        token = _current.set(metrics)
+        try:
+            for alias in settings.CACHES:
+                _instrument_cache(caches[alias])
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.duration = time.perf_counter() - metrics.started
+        if request.resolver_match is not None:
+            metrics.view = request.resolver_match.view_name
+        registry.observe(metrics, request.method, response.status_code)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+        response.metrics = metrics
+        if metrics.over_budget:
+            message = (
+                f'{metrics.view}: {metrics.queries} SQL-запросов '
+                f'при бюджете {metrics.budget}')
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.budget = getattr(view_func, 'query_budget', None)
@@ -0,0 +1,96 @@
+"""
+Пул соединений процесса, общий для бэкенда PostgreSQL и кэша Redis.
+
+Django открывает отдельное соединение с базой и отдельный экземпляр кэша
+на каждый поток, поэтому пул живет на уровне класса и выбирается по
+ключу. Пулы создаются лениво, уже после fork воркера.
+"""
+import threading
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @classmethod
+    def for_key(cls, key, max_size, timeout):
+        """Пул для ``key``, например псевдонима и адреса базы."""
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(max_size, timeout)
+                cls._pools[key] = pool
+            return pool
+
+    @classmethod
+    def disconnect_all(cls):
+        """Закрыть свободные соединения всех пулов, например перед DROP."""
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+        for pool in pools:
+            pool.disconnect()
+
+    def acquire(self, connect):
+        """
+        Свободное соединение из пула или новое от ``connect()``. Если все
+        ``max_size`` соединений заняты дольше ``timeout``, поднимается
+        ``PoolTimeout``.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'Все {self.max_size} соединений заняты '
+                f'дольше {self.timeout} с')
+        try:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+            return connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, reusable=True):
+        """Вернуть соединение в пул или закрыть его, если оно испорчено."""
+        try:
+            if reusable:
+                with self._lock:
+                    self._idle.append(connection)
+            else:
+                connection.close()
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, connect, reusable_errors=()):
+        """
+        Соединение на время блока. После исключения оно закрывается, кроме
+        ``reusable_errors`` — ошибок, после которых протокол не сломан.
+        """
+        connection = self.acquire(connect)
+        reusable = False
+        try:
+            yield connection
+            reusable = True
+        except reusable_errors:
+            reusable = True
+            raise
+        finally:
+            self.release(connection, reusable)
+
+    def disconnect(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
@@ -0,0 +1,89 @@
+"""
+Чтение с реплик базы данных.
+
+``ReplicaRoutingMiddleware`` разрешает читать с реплик только внутри
+запросов GET и HEAD; management-команды, сигналы вне запроса и все записи
+работают с ``default``. Реплика отстает от основной базы, поэтому после
+записи пользователь на ``REPLICA_PIN_SECONDS`` секунд закрепляется за
+основной базой cookie и видит свои изменения: новый пост, правку,
+комментарий или подписку. Внутри запроса после первой записи все чтения
+тоже идут в основную базу.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_current = ContextVar('database_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, replica_reads):
+        self.replica_reads = replica_reads
+        self.wrote = False
+
+
+def reads_from_replica():
+    """Пойдут ли чтения текущего запроса на реплику."""
+    state = _current.get()
+    return (
+        state is not None
+        and state.replica_reads
+        and not state.wrote
+        and bool(settings.DATABASE_REPLICAS)
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reads_from_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        exempt = model._meta.label_lower in settings.REPLICA_PIN_EXEMPT
+        if state is not None and not exempt:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит с основной базы через репликацию.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Должна стоять сразу после ``RequestMetricsMiddleware``, чтобы сессия
+    и пользователь тоже читались по общим правилам.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES)
+        token = _current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
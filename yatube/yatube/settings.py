@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from yatube.caches import cache_from_url, is_shared_cache
+from yatube.databases import database_from_url
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -40,6 +42,7 @@ INSTALLED_APPS = [
     'users',
     'posts',
     'about',
+    'tasks',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.RequestMetricsMiddleware',
+    'yatube.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -84,14 +89,37 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+# Без DATABASE_URL используется локальный SQLite в режиме WAL. В продакшене
+# DATABASE_URL=postgres://user:password@db:5432/yatube?conn_max_age=60
+# держит соединения открытыми и проверяет их в начале запроса; параметр
+# &pool=20 включает пул соединений процесса.
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_from_url(os.environ.get(
+        'DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3'))),
 }
 
+# Реплики для чтения: DATABASE_REPLICA_URLS через запятую, например
+# sqlite:///replica.sqlite3 для локальной проверки. Запросы GET и HEAD
+# читают со случайной реплики; после записи пользователь на
+# REPLICA_PIN_SECONDS закрепляется за основной базой. В тестах реплики
+# зеркалируют основную базу.
+
+DATABASE_REPLICAS = []
+for index, url in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{index}'] = {
+        **database_from_url(url), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['yatube.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+# Записи в эти модели не закрепляют пользователя за основной базой:
+# сессии, кэш sorl-thumbnail и очередь задач, в которую GET ставит
+# генерацию недостающих миниатюр.
+REPLICA_PIN_EXEMPT = ('sessions.session', 'thumbnail.kvstore', 'tasks.task')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -134,6 +162,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+# Загрузка пишется во временный файл на той же файловой системе, что и
+# MEDIA_ROOT: при сохранении файл переименовывается, а не копируется.
+FILE_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, '.uploads')
 
 # Login
 
@@ -145,8 +176,103 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Post images
+# Миниатюры создаются задачей очереди после сохранения поста.
+
+# Варианты картинки для srcset: ширины, пропорции кадра и форматы в
+# порядке предпочтения. AVIF используется, только если Pillow его умеет
+# (Pillow >= 11.2 или пакет pillow-avif-plugin).
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_QUALITY = {'AVIF': 60, 'WEBP': 80, 'JPEG': 85}
+POST_IMAGE_SIZES = '(max-width: 576px) 100vw, 960px'
+
+# Ограничения на загружаемую картинку проверяются по мере чтения запроса:
+# размер файла в байтах, число пикселей по заголовку и формат.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Home timeline
+
+TIMELINE_MAX_LENGTH = 800
+TIMELINE_FANOUT_MAX_FOLLOWERS = 5000
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Tasks
+# Побочные эффекты записей — ленты подписок, поисковый индекс, миниатюры —
+# ставятся в очередь в таблице tasks_task и выполняются командой
+# run_tasks. При TASKS_EAGER=1 задачи выполняются сразу в процессе,
+# который их поставил, и воркер не нужен; так работают тесты
+# (tasks.testing). Задержки — в секундах.
+
+TASKS_EAGER = os.environ.get('TASKS_EAGER', '0') == '1'
+TASKS_WORKER_PROCESSES = 2
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 10
+TASKS_RETRY_MAX_DELAY = 60 * 60
+TASKS_LOCK_TIMEOUT = 60 * 5
+TASKS_RETENTION = 60 * 60 * 24 * 7
+
+TEST_RUNNER = 'yatube.testing.TestRunner'
+
+# Batch import
+# Наибольшее число строк NDJSON в одном запросе к /api/v1/batch/.
+
+BATCH_MAX_ROWS = 100_000
+
+# Cache
+# Общий для всех воркеров кэш задается адресом, например
+# CACHE_URL=redis://cache:6379/0?max_connections=50 или
+# CACHE_URL=memcached://cache1:11211,cache2:11211.
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': cache_from_url(
+        os.environ.get('CACHE_URL', 'locmem://'),
+        key_prefix=os.environ.get('CACHE_KEY_PREFIX', 'yatube'),
+        version=int(os.environ.get('CACHE_VERSION', 1)),
+    )
 }
+
+# Sessions and authentication
+# С общим кэшем (redis, memcached) сессия и пользователь запроса читаются
+# из кэша, а в базу идут только при промахе; кэшированный пользователь
+# сбрасывается при сохранении. Кэш в памяти процесса другие воркеры не
+# видят: после смены пароля или выхода они продолжали бы пускать по
+# старой сессии, поэтому без общего кэша сессии и пользователи читаются
+# из базы.
+
+if is_shared_cache(CACHES['default']):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+USER_CACHE_TIMEOUT = 60 * 15
+
+# Page cache
+# Фрагменты index, group и profile сбрасываются сменой поколения. С общим
+# кэшем смену видят все воркеры, и фрагменты хранятся без срока жизни;
+# кэш в памяти процесса другие воркеры не сбрасывают, поэтому в нем
+# срок жизни конечный.
+
+PAGE_CACHE_TIMEOUT = None if is_shared_cache(CACHES['default']) else 60
+# Фрагменты, прочитанные с реплики, могут отставать от поколения.
+REPLICA_PAGE_CACHE_TIMEOUT = 60
+# Целые страницы для анонимов хранятся по пути и параметрам страницы,
+# поэтому срок жизни у них конечный.
+PAGE_RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+# Metrics
+# Страница /metrics/ для Prometheus доступна сотрудникам и сборщику с
+# заголовком «Authorization: Bearer $METRICS_TOKEN». За обратным прокси
+# REMOTE_ADDR у всех клиентов один, поэтому METRICS_ALLOWED_IPS по
+# умолчанию пуст. Заголовок Server-Timing раскрывает время работы базы и
+# шаблонов и отдается только при DEBUG. При QUERY_BUDGET_STRICT
+# превышение бюджета запросов view становится ошибкой, а не записью в лог.
+
+METRICS_SERVER_TIMING = DEBUG
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = []
+QUERY_BUDGET_STRICT = False
@@ -0,0 +1,36 @@
+"""
+Окружение тестов для ``manage.py test`` и pytest.
+
+Кроме синхронных задач (``tasks.testing``) объявляется реплика
+``replica1`` — так, как ее задал бы ``DATABASE_REPLICA_URLS``: в тестах
+она зеркалирует основную базу. Маршрутизация по-прежнему выключена, пока
+тест не включит ее через ``override_settings(DATABASE_REPLICAS=...)``.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tasks.testing import EagerTasksRunner
+
+from .databases import database_from_url
+
+TEST_REPLICA = 'replica1'
+
+
+def add_test_replica():
+    """Добавить реплику до создания тестовых баз."""
+    if TEST_REPLICA in settings.DATABASES:
+        return
+    settings.DATABASES[TEST_REPLICA] = {
+        **database_from_url('sqlite:///replica.sqlite3'),
+        'TEST': {'MIRROR': DEFAULT_DB_ALIAS},
+    }
+    # Если соединения уже настроены, новая база дополняется так же.
+    connections.ensure_defaults(TEST_REPLICA)
+    connections.prepare_test_settings(TEST_REPLICA)
+
+
+class TestRunner(EagerTasksRunner):
+    """Раннер ``manage.py test``."""
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        add_test_replica()
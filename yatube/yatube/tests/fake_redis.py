@@ -0,0 +1,151 @@
+"""
+Сервер в процессе теста, понимающий подмножество RESP, которым пользуется
+``yatube.caches.RedisCache``. Позволяет проверять бэкенд без Redis.
+"""
+import socketserver
+import threading
+import time
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.databases = {}
+        self.lock = threading.Lock()
+        self.connections = 0
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.db = 0
+        with self.server.lock:
+            self.server.connections += 1
+
+    @property
+    def data(self):
+        return self.server.databases.setdefault(self.db, {})
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            name = args[0].decode().lower()
+            command = getattr(self, f'cmd_{name}', None)
+            if command is None:
+                reply = ValueError(f'ERR unknown command {name}')
+            else:
+                with self.server.lock:
+                    reply = command(*args[1:])
+            self.wfile.write(self._encode(reply))
+
+    def _encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, ValueError):
+            return b'-%s\r\n' % str(reply).encode()
+        if isinstance(reply, str):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(
+                self._encode(item) for item in reply)
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+    def _get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def cmd_ping(self):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        self.db = int(db)
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self._get(key)
+
+    def cmd_mget(self, *keys):
+        return [self._get(key) for key in keys]
+
+    def cmd_set(self, key, value, *flags):
+        flags = [flag.upper() for flag in flags]
+        expires = None
+        if b'PX' in flags:
+            milliseconds = int(flags[flags.index(b'PX') + 1])
+            if milliseconds <= 0:
+                return ValueError('ERR invalid expire time in set')
+            expires = time.monotonic() + milliseconds / 1000
+        if b'NX' in flags and self._get(key) is not None:
+            return None
+        self.data[key] = (value, expires)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def cmd_exists(self, *keys):
+        return sum(self._get(key) is not None for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        value = self._get(key)
+        try:
+            number = int(value or 0) + int(delta)
+        except ValueError:
+            return ValueError('ERR value is not an integer or out of range')
+        _, expires = self.data.get(key, (None, None))
+        self.data[key] = (str(number).encode(), expires)
+        return number
+
+    def cmd_pexpire(self, key, milliseconds):
+        value = self._get(key)
+        if value is None:
+            return 0
+        self.data[key] = (value, time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def cmd_persist(self, key):
+        value = self._get(key)
+        if value is None or self.data[key][1] is None:
+            return 0
+        self.data[key] = (value, None)
+        return 1
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        return 'OK'
@@ -0,0 +1,117 @@
+import threading
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from ..caches import cache_from_url, is_shared_cache
+from ..pools import ConnectionPool
+from .fake_redis import FakeRedisServer
+
+
+class CacheFromUrlTest(SimpleTestCase):
+    def test_backends_selected_by_scheme(self):
+        backends = {
+            'locmem://': 'django.core.cache.backends.locmem.LocMemCache',
+            'dummy://': 'django.core.cache.backends.dummy.DummyCache',
+            'redis://cache:6379/1': 'yatube.caches.RedisCache',
+            'memcached://a:11211,b:11211': (
+                'django.core.cache.backends.memcached.PyMemcacheCache'),
+        }
+        for url, backend in backends.items():
+            with self.subTest(url=url):
+                self.assertEqual(cache_from_url(url)['BACKEND'], backend)
+
+    def test_prefix_version_and_pool_size(self):
+        config = cache_from_url(
+            'redis://cache:6379/1?max_connections=7',
+            key_prefix='yatube', version=3)
+        self.assertEqual(config['LOCATION'], 'redis://cache:6379/1')
+        self.assertEqual(config['OPTIONS'], {'MAX_CONNECTIONS': 7})
+        self.assertEqual(config['KEY_PREFIX'], 'yatube')
+        self.assertEqual(config['VERSION'], 3)
+        memcached = cache_from_url('memcached://a:11211,b:11211')
+        self.assertEqual(memcached['LOCATION'], ['a:11211', 'b:11211'])
+        self.assertTrue(memcached['OPTIONS']['use_pooling'])
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cache_from_url('couchbase://cache')
+
+    def test_shared_cache(self):
+        for url, shared in (('locmem://', False), ('dummy://', False),
+                            ('redis://cache:6379/0', True),
+                            ('memcached://cache1:11211', True)):
+            with self.subTest(url=url):
+                self.assertIs(is_shared_cache(cache_from_url(url)), shared)
+
+
+class RedisCacheTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedisServer().start()
+        cls.settings_override = override_settings(CACHES={
+            'default': cache_from_url(
+                cls.server.url + '?max_connections=4',
+                key_prefix='test', version=2),
+        })
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        ConnectionPool._pools.pop(('redis', cls.server.url)).disconnect()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache.clear()
+
+    def test_set_get_and_delete(self):
+        self.cache.set('post', {'text': 'Текст'})
+        self.assertEqual(self.cache.get('post'), {'text': 'Текст'})
+        self.assertTrue(self.cache.delete('post'))
+        self.assertIsNone(self.cache.get('post'))
+        self.assertEqual(self.cache.get('post', 'default'), 'default')
+
+    def test_keys_use_prefix_and_version(self):
+        self.cache.set('key', 'value')
+        self.assertIn(b'test:2:key', self.server.databases[0])
+        self.assertIsNone(self.cache.get('key', version=1))
+
+    def test_add_touch_and_timeouts(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('expired', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.touch('key', None))
+        self.assertFalse(self.cache.touch('missing', 10))
+
+    def test_many_and_incr(self):
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 'два'})
+        self.assertEqual(self.cache.incr('a', 5), 6)
+        self.assertEqual(self.cache.decr('a'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        with self.assertRaises(ValueError):
+            self.cache.incr('b')
+        self.cache.delete_many(['a', 'b'])
+        self.assertFalse(self.cache.has_key('a'))
+
+    def test_connections_are_pooled_across_threads(self):
+        def work():
+            for i in range(20):
+                caches['default'].set(f'key{i}', i)
+                caches['default'].get(f'key{i}')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(self.server.connections, 4)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from ..databases import database_from_url
+
+
+class DatabaseFromUrlTest(SimpleTestCase):
+    def test_sqlite_paths_and_pragmas(self):
+        relative = database_from_url('sqlite:///db.sqlite3')
+        self.assertEqual(relative['ENGINE'], 'yatube.db.sqlite3')
+        self.assertEqual(relative['NAME'], 'db.sqlite3')
+        self.assertEqual(relative['OPTIONS'], {})
+        absolute = database_from_url(
+            'sqlite:////var/lib/yatube.db?journal_mode=delete')
+        self.assertEqual(absolute['NAME'], '/var/lib/yatube.db')
+        self.assertEqual(absolute['OPTIONS'],
+                         {'pragmas': {'journal_mode': 'delete'}})
+
+    def test_postgresql(self):
+        config = database_from_url(
+            'postgres://yatube:p%40ss@db:5433/yatube'
+            '?pool=20&pool_timeout=2&sslmode=require&health_checks=no')
+        self.assertEqual(config['ENGINE'], 'yatube.db.postgresql')
+        self.assertEqual(
+            (config['NAME'], config['USER'], config['PASSWORD'],
+             config['HOST'], config['PORT']),
+            ('yatube', 'yatube', 'p@ss', 'db', '5433'))
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertFalse(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS'], {
+            'sslmode': 'require',
+            'pool': {'max_size': 20, 'timeout': 2.0},
+        })
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_url('mysql://db/yatube')
+
+
+class SQLitePragmasTest(SimpleTestCase):
+    def test_pragmas_applied_on_connect(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = ConnectionHandler({'default': database_from_url(
+                'sqlite:///' + os.path.join(directory, 'pragmas.db')
+                + '?busy_timeout=1500')})['default']
+            connection = wrapper.get_new_connection(
+                wrapper.get_connection_params())
+            try:
+                values = {
+                    pragma: connection.execute(
+                        f'PRAGMA {pragma}').fetchone()[0]
+                    for pragma in ('journal_mode', 'synchronous',
+                                   'busy_timeout')
+                }
+            finally:
+                connection.close()
+        # synchronous=NORMAL — это 1.
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 1500})
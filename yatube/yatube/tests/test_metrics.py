@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from ..metrics import QueryBudgetExceeded, query_budget, registry
+
+User = get_user_model()
+
+
+@query_budget(0)
+def greedy_view(request):
+    return HttpResponse(str(User.objects.count()))
+
+
+urlpatterns = [
+    path('greedy/', greedy_view, name='greedy'),
+]
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get('/')
+        self.assertEqual(response.metrics.view, 'index')
+        self.assertEqual(response.metrics.budget, 3)
+        self.assertGreater(response.metrics.queries, 0)
+        self.assertGreater(response.metrics.template_time, 0)
+        timing = response['Server-Timing']
+        self.assertIn(
+            f'desc="{response.metrics.queries} queries"', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('cache;desc=', timing)
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_header_is_optional(self):
+        self.assertNotIn('Server-Timing', self.client.get('/'))
+
+    def test_cache_hits_and_misses_are_counted(self):
+        self.client.get('/')
+        response = self.client.get('/')
+        self.assertGreater(response.metrics.cache_hits, 0)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_prometheus_endpoint(self):
+        self.client.get('/')
+        response = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn(
+            'yatube_requests_total{view="index",method="GET",status="200"} 1',
+            body)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="index",le="+Inf"} 1',
+            body)
+        self.assertIn('yatube_db_queries_total{view="index"}', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_prometheus_endpoint_is_not_public(self):
+        # За локальным прокси все клиенты приходят с 127.0.0.1.
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(
+                    '/metrics/', REMOTE_ADDR='127.0.0.1', **headers)
+                self.assertEqual(response.status_code, 403)
+
+    def test_prometheus_endpoint_for_staff(self):
+        staff = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_budget_overrun_is_recorded(self):
+        response = self.client.get('/greedy/')
+        self.assertTrue(response.metrics.over_budget)
+        self.assertIn(
+            'yatube_query_budget_exceeded_total{view="greedy"} 1',
+            registry.render())
+
+    @override_settings(ROOT_URLCONF=__name__, QUERY_BUDGET_STRICT=True)
+    def test_budget_overrun_fails_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/greedy/')
@@ -0,0 +1,38 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from ..pools import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def test_reuses_released_connections(self):
+        pool = ConnectionPool(max_size=2, timeout=1)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+        self.assertIs(pool.acquire(FakeConnection), first)
+
+    def test_broken_connection_is_closed_not_reused(self):
+        pool = ConnectionPool(max_size=1, timeout=1)
+        broken = pool.acquire(FakeConnection)
+        pool.release(broken, reusable=False)
+        self.assertTrue(broken.closed)
+        self.assertIsNot(pool.acquire(FakeConnection), broken)
+
+    def test_waits_for_free_slot(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        busy = pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        pool.timeout = 5
+        timer = threading.Timer(0.05, pool.release, [busy])
+        timer.start()
+        self.assertIs(pool.acquire(FakeConnection), busy)
+        timer.join()
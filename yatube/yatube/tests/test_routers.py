@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts import tasks
+from posts.models import Post
+from tasks.models import Task
+
+from ..routers import PIN_COOKIE, ReplicaRoutingMiddleware
+from ..testing import TEST_REPLICA
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.read_from = []
+
+    def call(self, request, write=None):
+        def view(request):
+            self.read_from.append(router.db_for_read(Post))
+            if write is not None:
+                router.db_for_write(write)
+                self.read_from.append(router.db_for_read(Post))
+            return HttpResponse()
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_get_reads_from_replica(self):
+        response = self.call(self.factory.get('/'))
+        self.assertEqual(self.read_from, ['replica'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_post_reads_from_primary(self):
+        self.call(self.factory.post('/'))
+        self.assertEqual(self.read_from, ['default'])
+
+    def test_write_pins_to_primary(self):
+        response = self.call(self.factory.get('/follow/'), write=Post)
+        self.assertEqual(self.read_from, ['replica', 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.call(request)
+        self.assertEqual(self.read_from[-1], 'default')
+
+    def test_session_write_does_not_pin(self):
+        response = self.call(self.factory.get('/'), write=Session)
+        self.assertEqual(self.read_from, ['replica', 'replica'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_outside_request_reads_from_primary(self):
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], TASKS_EAGER=False)
+class QueueRoutingTest(TestCase):
+    def test_enqueue_during_get_does_not_pin(self):
+        """GET ставит в очередь, например, недостающие миниатюры."""
+        def view(request):
+            tasks.index_post.enqueue(1)
+            return HttpResponse()
+        request = RequestFactory().get('/')
+        response = ReplicaRoutingMiddleware(view)(request)
+        self.assertTrue(Task.objects.exists())
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=[TEST_REPLICA])
+class ReplicaDatabaseTest(TransactionTestCase):
+    """
+    Реплика — отдельный файл SQLite, а репликацию заменяет копия основной
+    базы (``replicate``): все, что записано после нее, есть только в
+    основной базе, и по ответу видно, откуда он прочитан.
+    """
+    databases = {'default', TEST_REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_path = os.path.join(
+            tempfile.mkdtemp(), 'replica.sqlite3')
+        replica = connections[TEST_REPLICA]
+        replica.close()
+        # У зеркала settings_dict — тот же словарь, что у основной базы.
+        cls.mirrored_settings = replica.settings_dict
+        replica.settings_dict = {
+            **replica.settings_dict, 'NAME': cls.replica_path}
+
+    @classmethod
+    def tearDownClass(cls):
+        replica = connections[TEST_REPLICA]
+        replica.close()
+        replica.settings_dict = cls.mirrored_settings
+        shutil.rmtree(os.path.dirname(cls.replica_path))
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='AndreyG')
+        self.client.force_login(self.author)
+        Post.objects.create(text='Пост до копии', author=self.author)
+        self.replicate()
+        Post.objects.create(text='Пост после копии', author=self.author)
+
+    def replicate(self):
+        connections[TEST_REPLICA].close()
+        if os.path.exists(self.replica_path):
+            os.remove(self.replica_path)
+        with connections['default'].cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [self.replica_path])
+
+    def test_get_reads_from_replica(self):
+        for client in (Client(), self.client):
+            with self.subTest(authenticated=client is self.client):
+                response = client.get(reverse('index'))
+                self.assertContains(response, 'Пост до копии')
+                self.assertNotContains(response, 'Пост после копии')
+
+    def test_writes_and_pinned_reads_go_to_primary(self):
+        response = self.client.post(
+            reverse('new_post'), {'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(Post.objects.using('default').filter(
+            text='Новый пост').exists())
+        self.assertFalse(Post.objects.using(TEST_REPLICA).filter(
+            text='Новый пост').exists())
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Пост после копии')
+        self.assertContains(response, 'Новый пост')
@@ -4,12 +4,16 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf.urls.static import static
 
+from .views import metrics
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"   # noqa
 
 urlpatterns = [
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
+    path("metrics/", metrics, name="metrics"),
+    path("api/v1/", include("posts.api_urls", namespace="api")),
     path("", include("posts.urls")),
     path("admin/", admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
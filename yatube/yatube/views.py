@@ -1,6 +1,13 @@
+import hmac
 from http import HTTPStatus
 
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET
+
+from .metrics import registry
 
 
 def page_not_found(request, exception):
@@ -18,3 +25,27 @@ def server_error(request):
         "misc/500.html",
         status=HTTPStatus.INTERNAL_SERVER_ERROR
     )
+
+
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode())
+
+
+@require_GET
+def metrics(request):
+    """
+    Метрики процесса в текстовом формате Prometheus: для сотрудников,
+    сборщика с заголовком ``Authorization: Bearer <METRICS_TOKEN>`` и
+    адресов из ``METRICS_ALLOWED_IPS``.
+    """
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not (allowed or _has_metrics_token(request)
+            or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )